@@ -1,20 +1,108 @@
+import mmap
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 import fitz # type: ignore
+from abm_store import abm_store, file_hash
+from assets import PDF_PARALLEL_MIN_PAGES, PDF_PAGES_PER_TASK, PDF_WORKERS
+from utils import generate_pdf_summary
 
 
 
 ABM_FOLDER = "abm_reports"
+PAGE_BREAK = "\f"  # between pages of the extracted text, so summaries can work on page ranges
 
 
-def extract_text_from_pdf(uploaded_pdf):
+def extract_page_range(path: str, start: int, stop: int):
+    """Process-pool task: text of pages [start, stop). Each worker opens the file itself."""
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def extract_text_from_file(path: str, workers: int = PDF_WORKERS, pages_per_task: int = PDF_PAGES_PER_TASK):
+    """
+    Text of a PDF on disk. Reports of PDF_PARALLEL_MIN_PAGES pages or more are
+    split into page ranges extracted in parallel worker processes; PyMuPDF
+    reads pages from the file on demand, so the whole PDF is never loaded
+    into (or pickled between) processes.
+    """
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+            if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+                return PAGE_BREAK.join([page.get_text() for page in doc])
+
+        ranges = [(start, min(start + pages_per_task, page_count))
+                  for start in range(0, page_count, pages_per_task)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+            parts = executor.map(extract_page_range, [path] * len(ranges),
+                                 [r[0] for r in ranges], [r[1] for r in ranges])
+            return PAGE_BREAK.join(text for part in parts for text in part)
+    except Exception as e:
+        print(f"Error reading ABM PDF: {e}")
+        return ""
+
+
+def extract_text_from_bytes(data: bytes):
     try:
           # PyMuPDF
-        doc = fitz.open(stream=uploaded_pdf.read(), filetype="pdf")
-        return "\n".join([page.get_text() for page in doc])
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            if doc.page_count < PDF_PARALLEL_MIN_PAGES:
+                return PAGE_BREAK.join([page.get_text() for page in doc])
     except Exception as e:
         print(f"Error reading ABM PDF: {e}")
         return ""
 
+    # Large upload: spill to a temp file so the worker processes can open it by path
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "upload.pdf")
+        with open(path, "wb") as f:
+            f.write(data)
+        return extract_text_from_file(path)
+
+
+def extract_text_from_pdf(uploaded_pdf):
+    return extract_text_from_bytes(uploaded_pdf.read())
+
+
+def load_abm_text(data: bytes, name: str = ""):
+    """
+    Text of one ABM PDF, parsed once per distinct file content and then
+    served from the ABM context store.
+    """
+    digest = file_hash(data)
+    text = abm_store.get_text(digest)
+    if text is None:
+        text = extract_text_from_bytes(data)
+        if text:
+            abm_store.set_text(digest, name, text)
+    return text
+
+
+def load_abm_file_text(path: str):
+    """load_abm_text for a PDF on disk; the file is memory-mapped for hashing rather than read."""
+    if os.path.getsize(path) == 0:
+        return ""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        digest = file_hash(mapped)
+    text = abm_store.get_text(digest)
+    if text is None:
+        text = extract_text_from_file(path)
+        if text:
+            abm_store.set_text(digest, os.path.basename(path), text)
+    return text
+
+
+def load_abm_summary(data: bytes, model: str, text: str = None):
+    """LLM summary of one ABM PDF, generated once per (file content, model)."""
+    digest = file_hash(data)
+    summary = abm_store.get_summary(digest, model)
+    if summary is None:
+        summary = generate_pdf_summary(text if text is not None else load_abm_text(data), model)
+        if summary and summary != "Summary unavailable.":
+            abm_store.set_summary(digest, model, summary)
+    return summary
+
 
 def get_abm_report_text():
     all_text = []
@@ -22,14 +110,8 @@ def get_abm_report_text():
         print(f"Directory '{ABM_FOLDER}' not found. Returning empty context.")
         return ""
 
-    for fname in os.listdir(ABM_FOLDER):
+    for fname in sorted(os.listdir(ABM_FOLDER)):
         if fname.endswith(".pdf"):
-            fpath = os.path.join(ABM_FOLDER, fname)
-            with open(fpath, "rb") as f:
-                extracted = extract_text_from_pdf(fpath)
-                all_text.append(extracted)
-
-            
-            
-    
+            all_text.append(load_abm_file_text(os.path.join(ABM_FOLDER, fname)))
+
     return "\n\n".join(all_text)
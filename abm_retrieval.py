@@ -0,0 +1,109 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import List
+from assets import ABM_PASSAGE_WORDS, ABM_TOP_K, ABM_CONTEXT_CHARS
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "our", "that", "the", "their", "this", "to", "was", "we", "were", "will",
+    "with", "which", "who", "also", "can", "more", "than", "into", "other", "over", "such",
+}
+MAX_CACHED_INDEXES = 8
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def split_passages(text: str, max_words: int = ABM_PASSAGE_WORDS) -> List[str]:
+    """
+    Paragraph-aligned passages of about `max_words` words: short paragraphs
+    are merged, long ones are cut into windows.
+    """
+    passages, current, count = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        words = paragraph.split()
+        if not words:
+            continue
+        while len(words) > max_words:
+            if current:
+                passages.append(" ".join(current))
+                current, count = [], 0
+            passages.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        if count + len(words) > max_words and current:
+            passages.append(" ".join(current))
+            current, count = [], 0
+        current.extend(words)
+        count += len(words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of passages. Pure Python, deterministic."""
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(p)) for p in passages]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter(term for tf in self.term_freqs for term in tf)
+        n = len(passages)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query: str) -> List[float]:
+        query_terms = [t for t in set(tokenize(query)) if t in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            results.append(sum(
+                self.idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in query_terms if t in tf
+            ))
+        return results
+
+    def search(self, query: str, k: int = ABM_TOP_K):
+        """Top-k (passage_index, score) with a positive score, best first; ties keep document order."""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: (-item[1], item[0]))
+        return [(idx, score) for idx, score in ranked[:k] if score > 0]
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_abm_index(abm_context: str) -> BM25Index:
+    """BM25 index of the ABM text, built once per distinct context and kept in memory."""
+    key = hashlib.sha256(abm_context.encode("utf-8")).hexdigest()
+    with _lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = BM25Index(split_passages(abm_context))
+            _indexes[key] = index
+            while len(_indexes) > MAX_CACHED_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+    return index
+
+
+def relevant_abm_context(abm_context: str, query: str, k: int = ABM_TOP_K, max_chars: int = ABM_CONTEXT_CHARS) -> str:
+    """
+    The top-k ABM passages for `query` (an article, or a company profile),
+    in document order and capped at max_chars. Replaces the blind
+    abm_context[:4000] slice; contexts that already fit are returned whole,
+    and a query with no overlap falls back to the leading passages.
+    """
+    if not abm_context or len(abm_context) <= max_chars:
+        return abm_context or ""
+    index = get_abm_index(abm_context)
+    hits = index.search(query, k)
+    picked = sorted(idx for idx, _ in hits) or list(range(min(k, len(index.passages))))
+    return "\n\n".join(index.passages[idx] for idx in picked)[:max_chars]
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from assets import ABM_CACHE_PATH
+
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ABMContextStore:
+    """
+    On-disk store of processed ABM reports, keyed by the SHA-256 of the PDF
+    bytes: the extracted text once per file, and the LLM summary once per
+    (file, model). Renaming or re-uploading the same PDF hits the same entry;
+    editing it changes the hash and is processed afresh. Section summaries
+    used by the map-reduce summarizer are keyed by the hash of their page
+    range's text instead, so an edited report only re-summarizes the
+    sections that changed.
+    """
+
+    def __init__(self, path: str = ABM_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS abm_text (
+                    hash TEXT PRIMARY KEY,
+                    name TEXT,
+                    text TEXT,
+                    created_at REAL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS abm_summary (
+                    hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    summary TEXT,
+                    created_at REAL,
+                    PRIMARY KEY (hash, model)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS abm_section_summary (
+                    hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    summary TEXT,
+                    created_at REAL,
+                    PRIMARY KEY (hash, model)
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get_text(self, digest: str):
+        with self._lock:
+            row = self._connect().execute("SELECT text FROM abm_text WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def set_text(self, digest: str, name: str, text: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO abm_text (hash, name, text, created_at) VALUES (?, ?, ?, ?)",
+                (digest, name, text, time.time())
+            )
+            conn.commit()
+
+    def get_summary(self, digest: str, model: str):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT summary FROM abm_summary WHERE hash = ? AND model = ?", (digest, model)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_summary(self, digest: str, model: str, summary: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO abm_summary (hash, model, summary, created_at) VALUES (?, ?, ?, ?)",
+                (digest, model, summary, time.time())
+            )
+            conn.commit()
+
+    def get_section_summary(self, digest: str, model: str):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT summary FROM abm_section_summary WHERE hash = ? AND model = ?", (digest, model)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_section_summary(self, digest: str, model: str, summary: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO abm_section_summary (hash, model, summary, created_at) VALUES (?, ?, ?, ?)",
+                (digest, model, summary, time.time())
+            )
+            conn.commit()
+
+
+abm_store = ABMContextStore()
@@ -1,25 +1,62 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
+from contextvars import ContextVar
 from dotenv import load_dotenv
 from supabase import create_client
 from assets import MODELS_USED
 
 load_dotenv()
+
+KEY_NAMES = sorted({name for names in MODELS_USED.values() for name in names} | {"SUPABASE_URL", "SUPABASE_ANON_KEY"})
+
+# Sidebar values a background job was submitted with, set in its worker
+# thread: worker threads have no Streamlit session to read them from
+job_credentials = ContextVar("job_credentials", default=None)
+
+def session_value(name):
+    """
+    Value typed into the Streamlit sidebar. Outside a Streamlit script run
+    (CLI, background workers) it is the value from the current job's
+    credentials, or None.
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return (job_credentials.get() or {}).get(name)
+    return st.session_state.get(name)
+
+def session_credentials():
+    """Captures the sidebar's API keys and Supabase settings to hand to a background job."""
+    return {name: session_value(name) for name in KEY_NAMES if session_value(name)}
+
+def with_credentials(fn):
+    """
+    Wraps fn so it runs with the calling thread's job credentials, for work
+    handed to a new thread or a thread pool (which do not inherit them).
+    """
+    credentials = job_credentials.get()
+    def run(*args, **kwargs):
+        token = job_credentials.set(credentials)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            job_credentials.reset(token)
+    return run
+
 def get_api_key(model):
     """
     Returns an API key for a given model by:
       1) Looking up the environment var name in MODELS_USED[model].
          (We assume there's exactly one item in that set.)
-      2) Returning the key from st.session_state if present;
+      2) Returning the key from st.session_state if present (Streamlit runs only);
          otherwise from os.environ.
     """
     env_var_name = list(MODELS_USED[model])[0]  
-    return st.session_state.get(env_var_name) or os.getenv(env_var_name)
+    return session_value(env_var_name) or os.getenv(env_var_name)
 
 def get_supabase_client():
     """Returns a Supabase client if credentials exist, otherwise shows a guide."""
-    supabase_url = st.session_state.get('SUPABASE_URL') or os.getenv('SUPABASE_URL')
-    supabase_key = st.session_state.get('SUPABASE_ANON_KEY') or os.getenv('SUPABASE_ANON_KEY')
+    supabase_url = session_value('SUPABASE_URL') or os.getenv('SUPABASE_URL')
+    supabase_key = session_value('SUPABASE_ANON_KEY') or os.getenv('SUPABASE_ANON_KEY')
 
     if not supabase_url or not supabase_key or "your-supabase-url-here" in supabase_url:
         return None
@@ -20,6 +20,136 @@ TIMEOUT_SETTINGS = {
 
 NUMBER_SCROLL = 2
 
+DEFAULT_FIELDS = [
+    "Article Name", "Article Summary", "Article Date", "Article URL",
+    "Company", "Company Info", "Region", "Company Size", "Raised Funding",
+    "Recent Developments", "Partnerships", "Media Mentions", "Focus",
+    "Humanoid Robotics Use Case", "Single Use Cases", "Task Streamlining",
+    "Project launch date", "Relevancy Score", "Correlation Reason"
+]
+
+# Number of headless browsers kept warm for one fetch_and_store_markdowns run
+CRAWLER_POOL_SIZE = 3
+
+# Bounded-parallel fetch stage: URLs in flight overall and per host
+FETCH_CONCURRENCY = CRAWLER_POOL_SIZE
+FETCH_PER_HOST_CONCURRENCY = 2
+
+# Streaming pipeline: max items buffered between stages and parallel extraction workers
+PIPELINE_QUEUE_SIZE = 8
+EXTRACT_CONCURRENCY = 2
+PIPELINE_STOP_POLL_SECONDS = 0.5  # how often a waiting pipeline checks for a stop request
+
+# Background scrape jobs (jobs.py). Each running job has its own crawler pool, so at most
+# JOB_WORKERS * CRAWLER_POOL_SIZE browsers are open; LLM calls share the global rate-limit scheduler.
+JOB_WORKERS = 2
+JOB_HISTORY = 20  # finished jobs kept for viewing / download
+JOB_POLL_SECONDS = 2  # UI refresh interval while a job is running
+
+# Per-model provider quotas used by the LLM scheduler (requests / tokens per minute).
+# Set these to your account tier; unknown models fall back to DEFAULT_RATE_LIMIT.
+MODEL_RATE_LIMITS = {
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gemini/gemini-1.5-flash": {"rpm": 15, "tpm": 1000000},
+    "groq/deepseek-r1-distill-llama-70b": {"rpm": 30, "tpm": 6000},
+}
+DEFAULT_RATE_LIMIT = {"rpm": 60, "tpm": 60000}
+LLM_MAX_RETRIES = 5
+
+# Enrich all listings of an article with one structured request instead of 3–4 calls per listing
+BATCH_ENRICHMENT = True
+
+# Local cache of LLM responses keyed on model + messages + schema
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = ".cache/llm_cache.sqlite"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_MB = 512
+
+# Freshness index (ETag / Last-Modified / content hash per crawled URL)
+PAGE_INDEX_PATH = ".cache/page_index.sqlite"
+
+# Run manifest: per-URL stage checkpoints so an interrupted run resumes instead of restarting.
+# Unfinished runs older than the TTL are started afresh.
+RUN_MANIFEST_PATH = ".cache/run_manifest.sqlite"
+RUN_MANIFEST_TTL_SECONDS = 3 * 24 * 3600
+
+# Upper bound on page URLs generated for one paginated listing
+PAGINATION_MAX_PAGES = 20
+
+# Listing pages probed concurrently by markdown_io.get_paginated_urls
+PAGINATION_PROBE_WINDOW = 4
+
+# Rows per request for bulk Supabase reads and upserts
+SUPABASE_BATCH_SIZE = 100
+
+# Storage backend for the scraped_data table: "supabase" or "sqlite" (local file).
+# Override with the SCRAPER_STORAGE / SCRAPER_DB_PATH env vars.
+STORAGE_BACKEND = "supabase"
+LOCAL_DB_PATH = ".cache/scraped_data.sqlite"
+
+# Extracted ABM report text and summaries, keyed by PDF content hash
+ABM_CACHE_PATH = ".cache/abm_context.sqlite"
+
+# PDF text extraction: page ranges go to a process pool once a report is this long
+PDF_PARALLEL_MIN_PAGES = 50
+PDF_PAGES_PER_TASK = 25
+PDF_WORKERS = 4
+
+# ABM context retrieval: each request gets the top-k BM25 passages instead of the report's first 4000 chars
+ABM_PASSAGE_WORDS = 120
+ABM_TOP_K = 4
+ABM_CONTEXT_CHARS = 4000
+
+# generate_pdf_summary: reports over the section budget are summarized in page-range sections, then reduced
+PDF_SUMMARY_SECTION_TOKENS = 12000
+PDF_SUMMARY_PAGES_PER_SECTION = 10
+PDF_SUMMARY_CONCURRENCY = 4
+PDF_SUMMARY_REDUCE_FANIN = 8
+
+# Company knowledge store: enriched profiles + ABM scores reused across articles
+COMPANY_STORE_PATH = ".cache/company_store.sqlite"
+COMPANY_TTL_SECONDS = 14 * 24 * 3600
+COMPANY_MATCH_CUTOFF = 0.9  # difflib ratio for treating two names (generic words left out) as the same company
+COMPANY_FACT_OVERLAP = 0.5  # share of words two same-year developments need in common to be the same fact
+
+# GNews media-mention lookups (override the base URL with the GNEWS_BASE_URL env var, e.g. for a fake server)
+GNEWS_BASE_URL = "https://gnews.io/api/v4"
+GNEWS_TTL_SECONDS = 24 * 3600
+GNEWS_MIN_INTERVAL = 1.0  # seconds between requests
+GNEWS_DAILY_QUOTA = 100
+GNEWS_MAX_CONNECTIONS = 4
+GNEWS_BACKOFF_SECONDS = 60  # pause after a 429/403 without Retry-After
+
+# Result exports: written in chunks, text formats gzipped past these sizes
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_COMPRESS_ROWS = 20000
+EXPORT_COMPRESS_BYTES = 20 * 1024 * 1024
+
+# raw_data is stored as one compressed chunk per crawled page ("zstd", falls back to "zlib")
+RAW_CHUNK_CODEC = "zstd"
+RAW_CHUNK_LEVEL = 3
+
+# Max markdown tokens sent per extraction request; longer pages are split and extracted map-reduce style
+MODEL_CHUNK_TOKENS = {
+    "gpt-4o": 24000,
+    "gpt-4o-mini": 24000,
+    "gemini/gemini-1.5-flash": 200000,
+    "groq/deepseek-r1-distill-llama-70b": 4000,
+}
+DEFAULT_CHUNK_TOKENS = 8000
+CHUNK_EXTRACT_CONCURRENCY = 4
+
+# Boilerplate/navigation filter run on markdown before LLM extraction
+CONTENT_FILTER_ENABLED = True
+CONTENT_FILTER_DEBUG_DIR = ""  # or the CONTENT_FILTER_DEBUG_DIR env var; writes raw + filtered markdown per page
+FILTER_LINK_LINE_RATIO = 0.6  # blocks of 3+ lines where this share of lines are menu-style links
+FILTER_EDGE_SHARE = 0.15  # link lists in the first/last share of blocks (or before the first heading) are header/footer
+FILTER_NAV_LINK_MAX_WORDS = 4  # a link line with more words (anchor text included) is a headline, not a menu entry
+FILTER_REPEATED_MAX_WORDS = 60  # repeated link-bearing blocks up to this size are template chrome
+FILTER_BOILERPLATE_MAX_WORDS = 40  # short blocks matching cookie/newsletter/footer phrases
+FILTER_BOILERPLATE_SHARE = 0.5  # ... in more than this share of their sentences
+
 GENERIC_SYSTEM_MESSAGE = """
 You are an intelligent text extraction and conversion assistant. Your task is to extract structured information 
 from the given text and convert it into a pure JSON format. The JSON should contain only the structured data extracted from the text, 
@@ -68,7 +198,7 @@ Your Output Format (JSON):
       "Humanoid Robotics Use Case": "Yes/No + 1–2 lines",
       "Single Use Cases": "Yes/No + rationale",
       "Task Streamlining": "E.g. floor cleaning, inventory tracking",
-      "Project Launch Date": "Only if explicitly stated; otherwise 'TBD'",
+      "Project launch date": "Only if explicitly stated; otherwise 'TBD'",
       "Relevancy Score": "1–5",
       "Correlation Reason": "Use A–D format to explain relevance or irrelevance to ABM. You must include all four labels (A, B, C, D) as separate sentences, even if some are marked 'Not Applicable'.",
       "Article Name": "Original article title",
@@ -0,0 +1,101 @@
+"""
+Compares the old abm_context[:4000] truncation with BM25 retrieval of ABM
+passages (abm_retrieval.relevant_abm_context).
+
+Usage:
+    python benchmarks/bench_abm_retrieval.py --corpus saved_pages/ [--model gpt-4o] [--score --repeats 3]
+
+Offline it reports, per saved page, the ABM prompt tokens of both variants
+and how stable the retrieved passages are when 10% of the query words are
+dropped (mean Jaccard overlap of the top-k sets over several trials).
+
+With --score it also extracts the listings of each page and runs
+correlate_with_abm `--repeats` times per company with each variant, with
+the LLM cache switched off, and reports the spread of the relevancy scores.
+Needs the model's API key.
+"""
+import random
+import statistics
+import sys
+
+from harness import bench_parser, load_corpus  # puts the repo root on sys.path
+from abm_docs import get_abm_report_text
+from abm_retrieval import get_abm_index, relevant_abm_context
+from assets import ABM_TOP_K, ROBOTICS_SYSTEM_MESSAGE
+from chunking import count_tokens
+from llm_cache import llm_cache
+from llm_calls import call_llm_model_chunked
+from utils import correlate_with_abm
+
+
+def jaccard(a, b) -> float:
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def retrieval_stability(abm_context: str, query: str, trials: int, rng: random.Random) -> float:
+    index = get_abm_index(abm_context)
+    base = {idx for idx, _ in index.search(query, ABM_TOP_K)}
+    words = query.split()
+    overlaps = []
+    for _ in range(trials):
+        kept = [w for w in words if rng.random() > 0.1]
+        overlaps.append(jaccard(base, {idx for idx, _ in index.search(" ".join(kept), ABM_TOP_K)}))
+    return statistics.mean(overlaps) if overlaps else 1.0
+
+
+def score_spread(listing, abm_context, model, repeats):
+    scores = []
+    for _ in range(repeats):
+        work = dict(listing)
+        correlate_with_abm(work, abm_context, model)
+        scores.append(int(work["Relevancy Score"]))
+    return scores
+
+
+def main():
+    parser = bench_parser(__doc__, corpus=True, model=True)
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--score", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    abm_context = get_abm_report_text()
+    if not abm_context:
+        sys.exit("No ABM reports found in abm_reports/.")
+    truncated = abm_context[:4000]
+    truncated_tokens = count_tokens(truncated, args.model)
+    rng = random.Random(0)
+
+    print(f"ABM text: {len(abm_context)} chars, {len(get_abm_index(abm_context).passages)} passages\n")
+    print(f"{'page':<32} {'trunc tok':>10} {'bm25 tok':>9} {'saved':>7} {'stability':>10}")
+    pages = load_corpus(args.corpus)
+    for name, markdown in pages:
+        retrieved_tokens = count_tokens(relevant_abm_context(abm_context, markdown), args.model)
+        stability = retrieval_stability(abm_context, markdown, args.trials, rng)
+        print(f"{name[:32]:<32} {truncated_tokens:>10} {retrieved_tokens:>9} "
+              f"{truncated_tokens - retrieved_tokens:>7} {stability:>10.2f}")
+
+    if not args.score:
+        return
+
+    llm_cache.enabled = False
+    print(f"\n{'company':<32} {'truncated scores':<20} {'bm25 scores':<20}")
+    spreads = {"truncated": [], "bm25": []}
+    for _, markdown in pages:
+        parsed, _, _ = call_llm_model_chunked(markdown, args.model, ROBOTICS_SYSTEM_MESSAGE)
+        if hasattr(parsed, "model_dump"):
+            parsed = parsed.model_dump()
+        for listing in (parsed.get("listings") or []) if isinstance(parsed, dict) else []:
+            old = score_spread(listing, truncated, args.model, args.repeats)
+            new = score_spread(listing, abm_context, args.model, args.repeats)
+            spreads["truncated"].append(max(old) - min(old))
+            spreads["bm25"].append(max(new) - min(new))
+            print(f"{str(listing.get('company', ''))[:32]:<32} {str(old):<20} {str(new):<20}")
+
+    for label, values in spreads.items():
+        if values:
+            print(f"{label:<10} mean score spread {statistics.mean(values):.2f} over {len(values)} companies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Measures the token-aware chunker on a corpus of saved pages and, with
+--extract, compares one-shot extraction (call_llm_model on the whole page)
+with map-reduce extraction (call_llm_model_chunked).
+
+Usage:
+    python benchmarks/bench_chunking.py --corpus saved_pages/ --model gpt-4o [--max-tokens 4000] [--extract]
+
+`saved_pages/` holds one markdown file per page. Splitting runs offline;
+--extract needs the model's API key. Clear .cache/llm_cache.sqlite first so
+repeated runs are not served from the LLM response cache.
+"""
+from harness import bench_parser, load_corpus, timed  # puts the repo root on sys.path
+from assets import ROBOTICS_SYSTEM_MESSAGE
+from chunking import chunk_budget, count_tokens, split_markdown
+from llm_calls import call_llm_model, call_llm_model_chunked
+
+
+def listing_count(parsed) -> int:
+    if hasattr(parsed, "model_dump"):
+        parsed = parsed.model_dump()
+    return len(parsed.get("listings") or []) if isinstance(parsed, dict) else 0
+
+
+def main():
+    parser = bench_parser(__doc__, corpus=True, model=True)
+    parser.add_argument("--max-tokens", type=int, default=None)
+    parser.add_argument("--extract", action="store_true")
+    args = parser.parse_args()
+
+    max_tokens = args.max_tokens or chunk_budget(args.model)
+    print(f"model={args.model} chunk budget={max_tokens} tokens\n")
+    print(f"{'page':<32} {'tokens':>8} {'chunks':>7} {'largest':>8} {'split':>8}")
+
+    pages = load_corpus(args.corpus)
+    for name, markdown in pages:
+        chunks, elapsed = timed(split_markdown, markdown, args.model, max_tokens)
+        largest = max(count_tokens(chunk, args.model) for chunk in chunks)
+        print(f"{name[:32]:<32} {count_tokens(markdown, args.model):>8} {len(chunks):>7} "
+              f"{largest:>8} {elapsed * 1000:>6.1f}ms")
+
+    if not args.extract:
+        return
+
+    print(f"\n{'page':<32} {'mode':<10} {'seconds':>8} {'in tok':>8} {'out tok':>8} {'listings':>9}")
+    for name, markdown in pages:
+        for mode, fn in (("one-shot", call_llm_model), ("chunked", call_llm_model_chunked)):
+            kwargs = {"max_tokens": max_tokens} if fn is call_llm_model_chunked else {}
+            (parsed, tokens, _), elapsed = timed(fn, markdown, args.model, ROBOTICS_SYSTEM_MESSAGE, **kwargs)
+            print(f"{name[:32]:<32} {mode:<10} {elapsed:>8.2f} {tokens['input_tokens']:>8} "
+                  f"{tokens['output_tokens']:>8} {listing_count(parsed):>9}")
+
+
+if __name__ == "__main__":
+    main()
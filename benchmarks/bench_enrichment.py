@@ -0,0 +1,86 @@
+"""
+Compares per-listing enrichment (enrich_company_metadata + correlate_with_abm +
+extract_launch_date_from_article per company) with enrich_listings_batch.
+
+Usage:
+    python benchmarks/bench_enrichment.py --corpus saved_pages/ --model gpt-4o [--articles-per-batch 3]
+
+`saved_pages/` holds one markdown file per article. Listings are extracted once
+with call_llm_model and then enriched by both paths on separate copies, so
+both see identical input. Each pass runs with the LLM cache off and its own
+empty company store, so no pass is served by an earlier one. Needs the
+model's API key.
+"""
+import copy
+import os
+import tempfile
+import time
+
+from harness import bench_parser, load_corpus  # puts the repo root on sys.path
+from assets import ROBOTICS_SYSTEM_MESSAGE
+from abm_docs import get_abm_report_text
+from llm_calls import call_llm_model
+from llm_cache import llm_cache
+from llm_scheduler import scheduler
+from company_store import CompanyStore
+import scraper
+from utils import enrich_listings_batch
+
+
+def usage_snapshot(model):
+    stats = scheduler.stats().get(model, {})
+    return stats.get("requests", 0), stats.get("tokens", 0)
+
+
+def measure(label, model, fn):
+    requests_before, tokens_before = usage_snapshot(model)
+    with tempfile.TemporaryDirectory() as folder:
+        scraper.company_store = CompanyStore(os.path.join(folder, "companies.sqlite"))
+        llm_cache.enabled = False
+        start = time.perf_counter()
+        try:
+            fn()
+        finally:
+            elapsed = time.perf_counter() - start
+            llm_cache.enabled = True
+    requests_after, tokens_after = usage_snapshot(model)
+    print(f"{label:<28} {elapsed:>9.2f}s {requests_after - requests_before:>9} calls {tokens_after - tokens_before:>10} tokens")
+
+
+def main():
+    parser = bench_parser(__doc__, corpus=True, model=True)
+    parser.add_argument("--articles-per-batch", type=int, default=3)
+    args = parser.parse_args()
+
+    abm_context = get_abm_report_text()
+    articles = []
+    for _, markdown in load_corpus(args.corpus):
+        parsed, _, _ = call_llm_model(markdown, args.model, ROBOTICS_SYSTEM_MESSAGE, abm_context=abm_context)
+        if isinstance(parsed, dict) and isinstance(parsed.get("listings"), list):
+            articles.append((parsed, markdown))
+
+    listings = sum(len(parsed["listings"]) for parsed, _ in articles)
+    print(f"{len(articles)} articles, {listings} listings, model={args.model}\n")
+
+    def per_listing():
+        for parsed, markdown in copy.deepcopy(articles):
+            scraper.enrich_listings(parsed, markdown, args.model, abm_context, batch=False)
+
+    def batched_per_article():
+        for parsed, markdown in copy.deepcopy(articles):
+            scraper.enrich_listings(parsed, markdown, args.model, abm_context, batch=True)
+
+    def batched_across_articles():
+        work = copy.deepcopy(articles)
+        for i in range(0, len(work), args.articles_per_batch):
+            items = [(listing, markdown) for parsed, markdown in work[i:i + args.articles_per_batch]
+                     for listing in parsed["listings"]]
+            enrich_listings_batch(items, abm_context, args.model)
+
+    measure("per-listing", args.model, per_listing)
+    measure("batched (per article)", args.model, batched_per_article)
+    measure(f"batched ({args.articles_per_batch} articles)", args.model, batched_across_articles)
+
+
+if __name__ == "__main__":
+    main()
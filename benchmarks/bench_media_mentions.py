@@ -0,0 +1,50 @@
+"""
+Runs media-mention lookups for a simulated scrape (companies repeating across
+articles, looked up from several worker threads) against the local fake
+GNews server, and reports wall time and GNews requests made.
+
+Usage:
+    python benchmarks/bench_media_mentions.py [--companies 20] [--repeat 5] [--threads 4] [--latency 0.2]
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import bench_parser, timed  # puts the repo root on sys.path
+from fake_gnews import FakeGNews
+from news_utils import MediaMentionService
+import news_utils
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5, help="articles each company appears in")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--quota", type=int, default=100)
+    parser.add_argument("--min-interval", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeGNews(quota=args.quota, latency=args.latency).start()
+    news_utils.media_mentions = MediaMentionService(base_url=server.base_url, min_interval=args.min_interval)
+
+    names = [f"Robotics Company {i}" for i in range(args.companies)] * args.repeat
+    random.Random(0).shuffle(names)
+    articles = [names[i:i + 3] for i in range(0, len(names), 3)]
+
+    def lookup_all():
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            return list(executor.map(lambda article: news_utils.get_media_mentions_many(article, "test"), articles))
+
+    results, elapsed = timed(lookup_all)
+
+    lookups = sum(len(article) for article in articles)
+    print(f"{lookups} lookups for {args.companies} companies in {elapsed:.2f}s "
+          f"({server.requests} GNews requests, naive: {lookups} requests ~{lookups * args.latency:.1f}s serial)")
+    print(f"service stats: {news_utils.media_mentions.stats()}")
+    print(f"sample: {results[0]}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
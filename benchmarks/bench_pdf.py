@@ -0,0 +1,54 @@
+"""
+Compares serial PDF text extraction with the process-pool page-range path
+used by abm_docs.extract_text_from_file, on a synthetic report.
+
+Usage:
+    python benchmarks/bench_pdf.py [--pages 400] [--workers 1 2 4 8] [--pages-per-task 25]
+
+The synthetic PDF is written to a temp directory; no API keys are needed.
+"""
+import os
+import tempfile
+
+from harness import bench_parser, timed  # puts the repo root on sys.path
+import fitz  # type: ignore
+from abm_docs import extract_text_from_file
+
+PARAGRAPH = (
+    "ABM Industries delivers integrated facility services, engineering and "
+    "janitorial solutions across aviation, education and commercial real estate. "
+)
+
+
+def build_pdf(path: str, pages: int):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        rect = fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50)
+        page.insert_textbox(rect, f"Section {i}\n" + PARAGRAPH * 30, fontsize=9)
+    doc.save(path)
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pages-per-task", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "synthetic_report.pdf")
+        build_pdf(path, args.pages)
+        print(f"{args.pages} pages, {os.path.getsize(path) / 1e6:.1f} MB\n")
+
+        baseline = None
+        for workers in args.workers:
+            text, elapsed = timed(extract_text_from_file, path, workers=workers, pages_per_task=args.pages_per_task)
+            if baseline is None:
+                baseline = (elapsed, text)
+            same = "ok" if text == baseline[1] else "MISMATCH"
+            print(f"workers={workers:<3} {elapsed:>8.2f}s  x{baseline[0] / elapsed:>5.2f}  {len(text):>9} chars  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Local stand-in for the GNews search endpoint, for exercising news_utils
+without a real key or quota.
+
+Usage:
+    python benchmarks/fake_gnews.py [--port 8765] [--quota 100] [--latency 0.2]
+    GNEWS_BASE_URL=http://127.0.0.1:8765 GNEWS_API_KEY=test streamlit run streamlit_app.py
+
+GET /search?q="<company>" answers with a deterministic number of articles
+per company (0-100) after `latency` seconds, and with 429 once `quota`
+requests have been served.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from harness import bench_parser
+
+
+class FakeGNews(ThreadingHTTPServer):
+    def __init__(self, port: int = 0, quota: int = 100, latency: float = 0.0):
+        super().__init__(("127.0.0.1", port), FakeGNewsHandler)
+        self.quota = quota
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeGNewsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/").split("/")[-1] != "search":
+            self.send_error(404)
+            return
+        with self.server.lock:
+            self.server.requests += 1
+            over_quota = self.server.requests > self.server.quota
+        time.sleep(self.server.latency)
+        if over_quota:
+            self.send_response(429)
+            self.send_header("Retry-After", "30")
+            self.end_headers()
+            return
+        query = parse_qs(url.query).get("q", [""])[0].strip('"').lower()
+        count = int(hashlib.md5(query.encode("utf-8")).hexdigest(), 16) % 101
+        body = json.dumps({
+            "totalArticles": count,
+            "articles": [{"title": f"{query} article {i}"} for i in range(count)],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--quota", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    server = FakeGNews(args.port, args.quota, args.latency)
+    print(f"Fake GNews listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
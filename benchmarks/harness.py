@@ -0,0 +1,49 @@
+"""
+Setup shared by the benchmark scripts: importing this module puts the repo
+root on sys.path, and it provides the argument parser, the saved-page corpus
+loader and the timer they use.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def bench_parser(doc: str, corpus: bool = False, model: bool = False) -> argparse.ArgumentParser:
+    """
+    Parser whose help is the script's docstring, optionally with the common
+    --corpus (required) and --model options.
+    """
+    parser = argparse.ArgumentParser(description=doc, formatter_class=argparse.RawDescriptionHelpFormatter)
+    if corpus:
+        parser.add_argument("--corpus", required=True, help="folder with one saved markdown page per file")
+    if model:
+        parser.add_argument("--model", default="gpt-4o")
+    return parser
+
+
+def load_corpus(folder: str):
+    """
+    Returns:
+        [(file name, markdown)] for every *.md file in `folder`, by name
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.md"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Returns:
+        (fn's result, wall time in seconds)
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -0,0 +1,66 @@
+import re
+from typing import List
+from litellm import token_counter
+from assets import MODEL_CHUNK_TOKENS, DEFAULT_CHUNK_TOKENS
+
+BOUNDARY_RE = re.compile(r"\n(?=#{1,6}\s)|\n\n(?=\s*(?:[-*_]\s*){3,}\n)|\n{3,}")
+
+
+def count_tokens(text: str, model: str) -> int:
+    try:
+        return token_counter(model=model, text=text)
+    except Exception:
+        return len(text) // 4
+
+
+def chunk_budget(model: str) -> int:
+    return MODEL_CHUNK_TOKENS.get(model, DEFAULT_CHUNK_TOKENS)
+
+
+def split_sections(markdown: str) -> List[str]:
+    """Splits on headings, horizontal rules and runs of blank lines (page/article boundaries)."""
+    return [section for section in BOUNDARY_RE.split(markdown) if section.strip()]
+
+
+def split_oversized(section: str, max_tokens: int, model: str) -> List[str]:
+    """Breaks a section that alone exceeds the budget on paragraphs, then lines, then characters."""
+    for separator in ("\n\n", "\n"):
+        parts = [p for p in section.split(separator) if p.strip()]
+        if len(parts) > 1:
+            return pack(parts, max_tokens, model, separator)
+    step = max(1, max_tokens * 4)
+    return [section[i:i + step] for i in range(0, len(section), step)]
+
+
+def pack(parts: List[str], max_tokens: int, model: str, separator: str = "\n") -> List[str]:
+    """Greedily packs consecutive parts into chunks of at most max_tokens."""
+    chunks = []
+    current, current_tokens = [], 0
+    for part in parts:
+        tokens = count_tokens(part, model)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(split_oversized(part, max_tokens, model))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def split_markdown(markdown: str, model: str, max_tokens: int = None) -> List[str]:
+    """
+    Splits markdown into chunks that each fit the model's per-request token
+    budget, cutting only at headings, rules and page breaks where possible so
+    an article is not split mid-paragraph.
+    """
+    max_tokens = max_tokens or chunk_budget(model)
+    if count_tokens(markdown, model) <= max_tokens:
+        return [markdown]
+    return pack(split_sections(markdown), max_tokens, model)
@@ -0,0 +1,139 @@
+"""
+Headless batch runner: crawls, paginates and extracts a list of URLs without
+Streamlit.
+
+Usage:
+    python cli.py urls.txt --out runs/nightly [--model gpt-4o] [--fields "CEO,Headcount"]
+                  [--batch-size 20] [--pool-size 3] [--fetch-concurrency 3]
+                  [--extract-concurrency 2] [--storage sqlite] [--export csv parquet]
+
+`urls.txt` holds one URL per line (blank lines and # comments are ignored).
+Each batch runs fetch_and_store_markdowns -> scrape_urls and appends one JSON
+line per article to <out>/results.jsonl as soon as the batch finishes.
+Re-running the same command skips URLs already in results.jsonl, so an
+interrupted run continues where it stopped; URLs of the batch that was cut
+short resume from their run manifest checkpoints (already fetched, paginated
+or extracted work is not redone). API keys come from the environment / .env.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from assets import MODELS_USED, DEFAULT_FIELDS, CRAWLER_POOL_SIZE, FETCH_CONCURRENCY, EXTRACT_CONCURRENCY
+
+
+def read_urls(path: str):
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return list(dict.fromkeys(line for line in lines if line and not line.startswith("#")))
+
+
+def read_results(results_path: str):
+    if not os.path.exists(results_path):
+        return
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted write
+
+
+def completed_urls(results_path: str) -> set:
+    return {record.get("url") for record in read_results(results_path)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("urls_file")
+    parser.add_argument("--out", default="runs/latest", help="output directory (results.jsonl, exports)")
+    parser.add_argument("--model", default="gpt-4o", choices=list(MODELS_USED))
+    parser.add_argument("--fields", default="",
+                        help="comma-separated extra fields to extract, added to the app's default fields "
+                             "(which enrichment and scoring rely on)")
+    parser.add_argument("--batch-size", type=int, default=20, help="URLs per fetch/extract round; progress is saved after each")
+    parser.add_argument("--pool-size", type=int, default=CRAWLER_POOL_SIZE)
+    parser.add_argument("--fetch-concurrency", type=int, default=FETCH_CONCURRENCY)
+    parser.add_argument("--extract-concurrency", type=int, default=EXTRACT_CONCURRENCY)
+    parser.add_argument("--storage", choices=["supabase", "sqlite"], help="overrides SCRAPER_STORAGE")
+    parser.add_argument("--export", nargs="*", default=[], choices=["csv", "parquet", "xlsx"],
+                        help="also write the full results table in these formats when the run ends")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.storage:
+        os.environ["SCRAPER_STORAGE"] = args.storage
+
+    # Imported after the storage choice is in the environment (markdown_io picks its backend at import)
+    from storage import get_storage
+    if get_storage() is None:
+        sys.exit("Supabase is not configured: set SUPABASE_URL / SUPABASE_ANON_KEY or use --storage sqlite.")
+    from abm_docs import get_abm_report_text
+    from markdown import fetch_and_store_markdowns, normalize_url
+    from scraper import scrape_urls
+    from exporter import build_export, export_plan, to_jsonable
+    from results_frame import build_results_frame
+    from run_manifest import run_manifest, run_key
+
+    # Like the app's field tags, --fields adds to the defaults rather than replacing them
+    fields = list(dict.fromkeys(DEFAULT_FIELDS + [f.strip() for f in args.fields.split(",") if f.strip()]))
+    os.makedirs(args.out, exist_ok=True)
+    results_path = os.path.join(args.out, "results.jsonl")
+
+    urls = read_urls(args.urls_file)
+    done = completed_urls(results_path)
+    pending = [url for url in urls if normalize_url(url) not in done]
+    print(f"[cli] {len(urls)} URLs, {len(urls) - len(pending)} already done, {len(pending)} to run with {args.model}")
+
+    abm_context = get_abm_report_text()
+    run_id = run_key(urls, args.model, fields, abm_context)
+    resumed = run_manifest.start(run_id)
+    if resumed:
+        print(f"[cli] Resuming run {run_id}: {resumed}")
+    started = time.perf_counter()
+    totals = {"input_tokens": 0, "output_tokens": 0, "cost": 0}
+
+    with open(results_path, "a", encoding="utf-8") as out:
+        for start in range(0, len(pending), max(1, args.batch_size)):
+            batch = list(dict.fromkeys(normalize_url(url) for url in pending[start:start + args.batch_size]))
+            unique_names = fetch_and_store_markdowns(batch, args.model, abm_context,
+                                                     pool_size=args.pool_size, max_concurrency=args.fetch_concurrency,
+                                                     run_id=run_id)
+            url_by_name = dict(zip(unique_names, batch))
+            in_tokens, out_tokens, cost, parsed_results = scrape_urls(
+                unique_names, fields, args.model, abm_context, max_workers=args.extract_concurrency, run_id=run_id
+            )
+            for result in parsed_results:
+                record = {"url": url_by_name.get(result["unique_name"]), "unique_name": result["unique_name"],
+                          "parsed_data": result["parsed_data"]}
+                out.write(json.dumps(record, default=to_jsonable) + "\n")
+            out.flush()
+
+            totals["input_tokens"] += in_tokens
+            totals["output_tokens"] += out_tokens
+            totals["cost"] += cost
+            finished = min(start + args.batch_size, len(pending))
+            print(f"[cli] {finished}/{len(pending)} URLs processed, {len(parsed_results)} articles extracted "
+                  f"in this batch, {time.perf_counter() - started:.0f}s elapsed, tokens in/out "
+                  f"{totals['input_tokens']}/{totals['output_tokens']}")
+
+    run_manifest.finish(run_id)
+
+    if args.export:
+        frame = build_results_frame(read_results(results_path))
+        for fmt in args.export:
+            file_name, _, compress = export_plan(fmt, rows=len(frame))
+            with build_export(fmt, frame, compress) as data, open(os.path.join(args.out, file_name), "wb") as f:
+                shutil.copyfileobj(data, f)
+            print(f"[cli] Wrote {os.path.join(args.out, file_name)}")
+
+    print(f"[cli] Done: {totals} -> {results_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from assets import COMPANY_STORE_PATH, COMPANY_TTL_SECONDS, COMPANY_MATCH_CUTOFF, COMPANY_FACT_OVERLAP
+from utils import normalize_company_name, apply_company_profile, COMPANY_SUFFIXES, LAUNCH_DATE_FIELD
+
+# Enriched profile keys kept per company (project_launch_date is per article, so it is not reused)
+PROFILE_KEYS = [
+    "company_info", "region", "focus", "company_size", "capital_raised", "recent_developments",
+    "partnerships", "media_mentions", "humanoids_focus", "single_use_case_type", "streamlined_tasks",
+]
+# Extracted listing fields that structured facts (funding, partners, dated developments) are read from
+FUNDING_FIELDS = ["Raised Funding", "Recent Developments", "Company Info"]
+PARTNER_FIELD = "Partnerships"
+DEVELOPMENT_FIELD = "Recent Developments"
+# Words shared by many company names; fuzzy matching only compares what is left
+GENERIC_NAME_WORDS = COMPANY_SUFFIXES | {
+    "robotics", "robotic", "robot", "robots", "ai", "automation", "automations", "technologies", "technology",
+    "tech", "systems", "system", "labs", "lab", "industries", "solutions", "dynamics", "intelligence", "the",
+}
+EMPTY_FACTS = {"", "n/a", "na", "none", "unknown", "tbd", "not provided", "not disclosed", "not available"}
+MONEY_RE = re.compile(r"([$€£]|\b(?:usd|eur|gbp)\s?)?(\d[\d,]*(?:\.\d+)?)\s*(billion|bn|million|mn|m|b|thousand|k)?\b",
+                      re.IGNORECASE)
+MONEY_UNITS = {"billion": 1e9, "bn": 1e9, "b": 1e9, "million": 1e6, "mn": 1e6, "m": 1e6, "thousand": 1e3, "k": 1e3}
+YEAR_RE = re.compile(r"\b(?:19|20)\d\d\b")
+ITEM_SPLIT_RE = re.compile(r"[\n;•]|(?<=\.)\s+")
+PARTNER_SPLIT_RE = re.compile(r"[,;/\n]|\band\b|&")
+# Words that say nothing about which development an item describes
+FACT_STOPWORDS = {
+    "the", "and", "for", "with", "its", "has", "have", "had", "was", "were", "from", "into", "that", "this", "which",
+    "company", "announced", "announces", "recently", "new", "also", "their", "they", "will", "over", "about",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+    "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+
+def listing_company(listing) -> str:
+    return listing.get("Company") or listing.get("company") or ""
+
+
+def listing_field(listing, field: str) -> str:
+    value = str(listing.get(field) or listing.get(field.lower().replace(" ", "_")) or "")
+    return "" if " ".join(value.lower().split()) in EMPTY_FACTS else value
+
+
+def funding_facts(text: str) -> set:
+    """Money amounts in `text`, to two significant digits, so "$25M" and "$25.1 million" agree."""
+    facts = set()
+    for currency, number, unit in MONEY_RE.findall(text):
+        unit = unit.lower()
+        if not currency and unit not in ("billion", "million"):
+            continue
+        value = float(number.replace(",", "")) * MONEY_UNITS.get(unit, 1)
+        if value:
+            facts.add(f"funding:{float(f'{value:.2g}'):.0f}")
+    return facts
+
+
+def development_tokens(text: str) -> set:
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower())
+            if len(word) > 2 and word not in FACT_STOPWORDS and not YEAR_RE.fullmatch(word)}
+
+
+def listing_facts(listing) -> set:
+    """
+    Structured facts an article extracted for this company: funding amounts,
+    partner names and dated developments (year plus the item's words).
+    Take them before enrichment, which overwrites several of these fields.
+    """
+    facts = set()
+    for field in FUNDING_FIELDS:
+        facts |= funding_facts(listing_field(listing, field))
+    for partner in PARTNER_SPLIT_RE.split(listing_field(listing, PARTNER_FIELD)):
+        name = normalize_company_name(partner)
+        # Longer items are descriptions of a partnership rather than a partner's name
+        if name and name not in EMPTY_FACTS and len(name.split()) <= 4:
+            facts.add(f"partner:{name}")
+    for item in ITEM_SPLIT_RE.split(listing_field(listing, DEVELOPMENT_FIELD)):
+        year = YEAR_RE.search(item)
+        tokens = development_tokens(item)
+        if year and tokens:
+            facts.add(f"development:{year.group()}:{' '.join(sorted(tokens))}")
+    return facts
+
+
+def new_facts(facts, known) -> set:
+    """
+    The facts not covered by `known`. Funding amounts and partners must
+    match exactly; a development matches a known one from the same year that
+    shares at least COMPANY_FACT_OVERLAP of the shorter one's words.
+
+    >>> a = {"Raised Funding": "$25M Series B", "Partnerships": "ABB, Siemens",
+    ...      "Recent Developments": "Raised a Series B round led by Tiger Global in March 2024."}
+    >>> b = {"Raised Funding": "25 million dollars", "Partnerships": "Siemens AG and ABB Ltd",
+    ...      "Recent Developments": "In March 2024 it closed its Series B, led by Tiger Global."}
+    >>> new_facts(listing_facts(b), listing_facts(a))
+    set()
+    """
+    known = set(known)
+    developments = []
+    for fact in known:
+        if fact.startswith("development:"):
+            _, year, words = fact.split(":", 2)
+            developments.append((year, set(words.split())))
+    fresh = set()
+    for fact in facts:
+        if fact in known:
+            continue
+        if fact.startswith("development:"):
+            _, year, words = fact.split(":", 2)
+            words = set(words.split())
+            if any(year == other_year and len(words & other) >= COMPANY_FACT_OVERLAP * min(len(words), len(other))
+                   for other_year, other in developments):
+                continue
+        fresh.add(fact)
+    return fresh
+
+
+def distinctive_name(normalized: str) -> str:
+    """The name without generic words, e.g. "locus robotics" -> "locus"."""
+    return " ".join(word for word in normalized.split() if word not in GENERIC_NAME_WORDS)
+
+
+def context_hash(abm_context: str) -> str:
+    return hashlib.sha256((abm_context or "").encode("utf-8")).hexdigest()
+
+
+class CompanyStore:
+    """
+    Knowledge store of enriched companies, keyed by normalized company name.
+
+    Keeps each company's enriched profile, ABM correlation reason and
+    relevancy score with the model and ABM context they were produced with,
+    plus the set of facts (from article extractions) they are based on.
+    Spelling variants are matched to an existing company with difflib on the
+    distinctive part of the name (generic words such as "robotics" or "inc"
+    left out, so "Locus Robotics" never matches "Lotus Robotics") and
+    remembered as aliases. An entry is reused while it is younger than
+    `ttl_seconds`, was made with the same model and ABM context, and the
+    new article brings no facts it has not seen (see new_facts: differently
+    worded articles about the same funding, partners and developments reuse
+    the entry).
+    """
+
+    def __init__(self, path: str = COMPANY_STORE_PATH, ttl_seconds: float = COMPANY_TTL_SECONDS,
+                 match_cutoff: float = COMPANY_MATCH_CUTOFF):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.match_cutoff = match_cutoff
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._aliases = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS companies (
+                    key TEXT PRIMARY KEY,
+                    name TEXT,
+                    profile TEXT,
+                    correlation_reason TEXT,
+                    relevancy_score TEXT,
+                    facts TEXT,
+                    model TEXT,
+                    abm_hash TEXT,
+                    enriched_at REAL,
+                    seen_at REAL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS company_aliases (
+                    alias TEXT PRIMARY KEY,
+                    key TEXT NOT NULL
+                )
+            """)
+            self._conn.commit()
+            self._aliases = dict(self._conn.execute("SELECT alias, key FROM company_aliases").fetchall())
+        return self._conn
+
+    def resolve(self, name: str):
+        """
+        Store key for a company name: exact alias match first, then the closest
+        fuzzy match on the distinctive words, else the name itself. Names with
+        no distinctive words only match exactly.
+        """
+        normalized = normalize_company_name(name)
+        if not normalized:
+            return None
+        with self._lock:
+            conn = self._connect()
+            if normalized in self._aliases:
+                return self._aliases[normalized]
+            key = normalized
+            distinctive = distinctive_name(normalized)
+            if distinctive:
+                candidates = {}
+                for alias, alias_key in self._aliases.items():
+                    candidates.setdefault(distinctive_name(alias), alias_key)
+                candidates.pop("", None)
+                matches = difflib.get_close_matches(distinctive, list(candidates), n=1, cutoff=self.match_cutoff)
+                if matches:
+                    key = candidates[matches[0]]
+            self._aliases[normalized] = key
+            conn.execute("INSERT OR IGNORE INTO company_aliases (alias, key) VALUES (?, ?)", (normalized, key))
+            conn.commit()
+            return key
+
+    def lookup(self, listing, model: str, abm_context: str):
+        """The stored entry for this listing's company if it can be reused as-is, else None."""
+        key = self.resolve(listing_company(listing))
+        if key is None:
+            return None
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM companies WHERE key = ?", (key,)).fetchone()
+        fresh = (
+            row is not None
+            and time.time() - row["enriched_at"] < self.ttl_seconds
+            and row["model"] == model
+            and row["abm_hash"] == context_hash(abm_context)
+            and not new_facts(listing_facts(listing), json.loads(row["facts"] or "[]"))
+        )
+        if not fresh:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE companies SET seen_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        return {
+            "profile": json.loads(row["profile"] or "{}"),
+            "correlation_reason": row["correlation_reason"],
+            "relevancy_score": row["relevancy_score"],
+        }
+
+    def remember(self, listing, model: str, abm_context: str, facts: set):
+        """
+        Stores the enriched profile and ABM score now on `listing`, adding
+        `facts` (listing_facts of the listing as extracted) to the company's.
+        """
+        key = self.resolve(listing_company(listing))
+        if key is None:
+            return
+        profile = {k: listing[k] for k in PROFILE_KEYS if k in listing}
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT facts FROM companies WHERE key = ?", (key,)).fetchone()
+            facts = set(facts) | set(json.loads(row["facts"] or "[]") if row else [])
+            conn.execute("""
+                INSERT OR REPLACE INTO companies
+                    (key, name, profile, correlation_reason, relevancy_score, facts, model, abm_hash, enriched_at, seen_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, listing_company(listing), json.dumps(profile, default=str),
+                  listing.get("Correlation Reason", ""), str(listing.get("Relevancy Score", "")),
+                  json.dumps(sorted(facts)), model, context_hash(abm_context), now, now))
+            conn.commit()
+
+    @staticmethod
+    def apply(listing, entry: dict):
+        """Copies a stored profile and score onto the listing, keeping its own (per-article) launch date."""
+        launch_date = listing.get(LAUNCH_DATE_FIELD) or listing.get("project_launch_date") or "TBD"
+        apply_company_profile(listing, dict(entry["profile"], project_launch_date=launch_date))
+        listing["Correlation Reason"] = entry["correlation_reason"]
+        listing["Relevancy Score"] = entry["relevancy_score"]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+company_store = CompanyStore()
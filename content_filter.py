@@ -0,0 +1,137 @@
+import os
+import re
+from collections import Counter
+from assets import (
+    CONTENT_FILTER_ENABLED, CONTENT_FILTER_DEBUG_DIR, FILTER_LINK_LINE_RATIO, FILTER_NAV_LINK_MAX_WORDS,
+    FILTER_REPEATED_MAX_WORDS, FILTER_BOILERPLATE_MAX_WORDS, FILTER_EDGE_SHARE, FILTER_BOILERPLATE_SHARE
+)
+from chunking import count_tokens
+
+BLOCK_SPLIT_RE = re.compile(r"\n\s*\n")
+LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+WORD_RE = re.compile(r"\w+")
+HEADING_RE = re.compile(r"^\s*#{1,6}\s")
+BULLET_RE = re.compile(r"^\s*(?:[-*+]|\d+\.)\s+")
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n")
+BOILERPLATE_RE = re.compile(
+    r"cookie|privacy policy|terms of (?:use|service)|all rights reserved|©|subscribe|newsletter|"
+    r"sign up|sign in|log in|accept all|skip to (?:main )?content|follow us|share this",
+    re.IGNORECASE
+)
+
+
+def block_key(block: str) -> str:
+    return " ".join(block.lower().split())
+
+
+def word_count(text: str) -> int:
+    return len(WORD_RE.findall(text))
+
+
+def is_link_line(line: str) -> bool:
+    """
+    A menu-style line: link(s) with short anchor text and at most a couple of
+    other words. Counting the anchor text keeps headline links (news index
+    pages) as content.
+    """
+    if not LINK_RE.search(line):
+        return False
+    line = BULLET_RE.sub("", line)
+    rest = LINK_RE.sub("", line)
+    return word_count(rest) <= 2 and word_count(LINK_RE.sub(r"\1", line)) <= FILTER_NAV_LINK_MAX_WORDS
+
+
+def is_boilerplate(block: str) -> bool:
+    """Most of the block's sentences are cookie/newsletter/footer phrases, not just one mention."""
+    sentences = [s for s in SENTENCE_SPLIT_RE.split(LINK_RE.sub(r"\1", block)) if word_count(s)]
+    matching = sum(bool(BOILERPLATE_RE.search(s)) for s in sentences)
+    return bool(sentences) and matching / len(sentences) > FILTER_BOILERPLATE_SHARE
+
+
+def edge_positions(blocks) -> set:
+    """
+    Indexes of the blocks in the page header (before the first heading, or
+    the first FILTER_EDGE_SHARE of blocks without one) and footer (the last
+    FILTER_EDGE_SHARE).
+    """
+    edge = max(1, round(len(blocks) * FILTER_EDGE_SHARE))
+    first_heading = next((i for i, b in enumerate(blocks) if HEADING_RE.match(b)), None)
+    header = first_heading if first_heading is not None else edge
+    return set(range(header)) | set(range(max(0, len(blocks) - edge), len(blocks)))
+
+
+def drop_reason(block: str, occurrences: int, at_edge: bool = False):
+    lines = [line for line in block.splitlines() if line.strip()]
+    words = word_count(LINK_RE.sub(r"\1", block))
+    if not LINK_RE.sub("", block).strip(" \n|-*"):
+        if all(l.lstrip().startswith("!") for l in lines):
+            return "image"
+    if occurrences > 1 and words <= FILTER_REPEATED_MAX_WORDS and (LINK_RE.search(block) or words <= 8):
+        return "repeated"
+    # Link lists in the body (e.g. a roundup's "- [Company](url)" bullets) are content
+    if ((occurrences > 1 or at_edge) and len(lines) >= 3
+            and sum(is_link_line(l) for l in lines) / len(lines) >= FILTER_LINK_LINE_RATIO):
+        return "link_list"
+    if words <= FILTER_BOILERPLATE_MAX_WORDS and not HEADING_RE.match(block) and is_boilerplate(block):
+        return "boilerplate"
+    return None
+
+
+def strip_boilerplate(markdown: str):
+    """
+    Deterministic content-density filter. Splits the markdown into blank-line
+    separated blocks and drops navigation/link lists (in the page header or
+    footer, or repeated), short linked blocks repeated across the page (menus
+    and footers of every paginated page), cookie and newsletter banners, and
+    image-only blocks. Repeated prose keeps its first occurrence.
+
+    Returns:
+        (filtered_markdown, {"blocks": n, "dropped": n, "reasons": {reason: n}})
+    """
+    blocks = [b for b in BLOCK_SPLIT_RE.split(markdown or "") if b.strip()]
+    counts = Counter(block_key(b) for b in blocks)
+    edges = edge_positions(blocks)
+    kept, seen, reasons = [], set(), Counter()
+    for i, block in enumerate(blocks):
+        key = block_key(block)
+        reason = drop_reason(block, counts[key], i in edges)
+        if reason is None and key in seen:
+            reason = "duplicate"
+        if reason:
+            reasons[reason] += 1
+            continue
+        seen.add(key)
+        kept.append(block)
+    report = {"blocks": len(blocks), "dropped": sum(reasons.values()), "reasons": dict(reasons)}
+    return "\n\n".join(kept), report
+
+
+def filter_for_extraction(unique_name: str, markdown: str, model: str, enabled: bool = CONTENT_FILTER_ENABLED):
+    """
+    Runs strip_boilerplate ahead of LLM extraction and reports the tokens saved.
+    The unfiltered markdown stays in raw_data; with the CONTENT_FILTER_DEBUG_DIR
+    env var (or asset) set, both versions are also written there as <unique_name>.raw.md /
+    <unique_name>.filtered.md for side-by-side inspection.
+
+    Returns:
+        (markdown_for_the_llm, report)
+    """
+    if not enabled or not markdown:
+        return markdown, {}
+    filtered, report = strip_boilerplate(markdown)
+    if not filtered.strip():
+        # Never hand the model an empty page because the heuristics misfired
+        filtered = markdown
+    report["tokens_before"] = count_tokens(markdown, model)
+    report["tokens_after"] = count_tokens(filtered, model)
+    report["tokens_saved"] = report["tokens_before"] - report["tokens_after"]
+    print(f"[content_filter] {unique_name}: dropped {report['dropped']}/{report['blocks']} blocks, "
+          f"saved {report['tokens_saved']} of {report['tokens_before']} tokens {report['reasons']}")
+
+    debug_dir = os.getenv("CONTENT_FILTER_DEBUG_DIR", CONTENT_FILTER_DEBUG_DIR)
+    if debug_dir:
+        os.makedirs(debug_dir, exist_ok=True)
+        for suffix, text in (("raw", markdown), ("filtered", filtered)):
+            with open(os.path.join(debug_dir, f"{unique_name}.{suffix}.md"), "w", encoding="utf-8") as f:
+                f.write(text)
+    return filtered, report
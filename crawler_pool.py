@@ -0,0 +1,98 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from crawl4ai import AsyncWebCrawler
+from assets import CRAWLER_POOL_SIZE
+
+
+class CrawlerPool:
+    """
+    Keeps up to `size` AsyncWebCrawler instances (one headless browser each)
+    warm for the lifetime of a run and hands them out one URL at a time.
+
+    Crawlers are launched lazily, so a run with a single URL only pays for
+    one browser launch. Use it as an async context manager so every browser
+    is closed at the end, even when a fetch raises.
+    """
+
+    def __init__(self, size: int = CRAWLER_POOL_SIZE):
+        self.size = max(1, int(size))
+        self._crawlers = []
+        self._idle = None
+        self._launch_lock = None
+        self.launch_seconds = 0.0
+        self.fetch_seconds = 0.0
+        self.launches = 0
+        self.fetches = 0
+        self.failures = 0
+
+    async def __aenter__(self):
+        self._idle = asyncio.Queue()
+        self._launch_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _launch(self) -> AsyncWebCrawler:
+        start = time.perf_counter()
+        crawler = AsyncWebCrawler()
+        await crawler.start()
+        self.launch_seconds += time.perf_counter() - start
+        self.launches += 1
+        self._crawlers.append(crawler)
+        return crawler
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a warm crawler, launching a new one only if the pool is not full yet."""
+        crawler = None
+        if self._idle.empty():
+            async with self._launch_lock:
+                if len(self._crawlers) < self.size:
+                    crawler = await self._launch()
+        if crawler is None:
+            crawler = await self._idle.get()
+        try:
+            yield crawler
+        finally:
+            self._idle.put_nowait(crawler)
+
+    async def fetch_page(self, url: str):
+        """
+        Returns:
+            (markdown, response_headers) — ("", {}) when the crawl fails
+        """
+        async with self.acquire() as crawler:
+            start = time.perf_counter()
+            try:
+                result = await crawler.arun(url=url)
+            finally:
+                self.fetch_seconds += time.perf_counter() - start
+                self.fetches += 1
+        if not result.success:
+            self.failures += 1
+            return "", {}
+        return result.markdown, dict(getattr(result, "response_headers", None) or {})
+
+    async def fetch_markdown(self, url: str) -> str:
+        markdown, _ = await self.fetch_page(url)
+        return markdown
+
+    async def close(self):
+        crawlers, self._crawlers = self._crawlers, []
+        for crawler in crawlers:
+            try:
+                await crawler.close()
+            except Exception as e:
+                print(f"[crawler_pool] Error closing crawler: {e}")
+
+    def report(self) -> dict:
+        return {
+            "pool_size": self.size,
+            "launches": self.launches,
+            "launch_seconds": round(self.launch_seconds, 3),
+            "fetches": self.fetches,
+            "fetch_seconds": round(self.fetch_seconds, 3),
+            "failures": self.failures,
+        }
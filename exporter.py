@@ -0,0 +1,128 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Iterable
+import pandas as pd
+from assets import EXPORT_CHUNK_ROWS, EXPORT_COMPRESS_BYTES, EXPORT_COMPRESS_ROWS
+
+# format -> (mime type, whether gzip helps; Parquet and XLSX are compressed already)
+EXPORT_FORMATS = {
+    "jsonl": ("application/x-ndjson", True),
+    "csv": ("text/csv", True),
+    "parquet": ("application/vnd.apache.parquet", False),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", False),
+}
+
+
+def to_jsonable(o):
+    return o.model_dump() if hasattr(o, "model_dump") else o.dict() if hasattr(o, "dict") else str(o)
+
+
+class JsonlSpool:
+    """
+    Appends scrape results to a JSONL temp file as they arrive, so the JSON
+    export never has to hold (or re-serialize) the whole result set.
+    """
+
+    def __init__(self, folder: str = None):
+        fd, self.path = tempfile.mkstemp(prefix="scrape_", suffix=".jsonl", dir=folder)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self.count = 0
+
+    def append(self, record: dict):
+        self._file.write(json.dumps(record, default=to_jsonable) + "\n")
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def write_jsonl(records: Iterable[dict], out: BinaryIO):
+    for record in records:
+        out.write((json.dumps(record, default=to_jsonable) + "\n").encode("utf-8"))
+
+
+def write_csv(df: pd.DataFrame, out: BinaryIO, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    for start in range(0, max(len(df), 1), chunk_rows):
+        df.iloc[start:start + chunk_rows].to_csv(text, index=False, header=start == 0, quoting=csv.QUOTE_MINIMAL)
+    text.detach()
+
+
+def write_parquet(df: pd.DataFrame, out: BinaryIO, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Object columns (mixed text / lists) are written as strings; fixing the
+    # schema up front keeps every row group consistent
+    object_cols = [col for col in df.columns if df[col].dtype == object]
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    for col in object_cols:
+        schema = schema.set(schema.get_field_index(str(col)), pa.field(str(col), pa.string()))
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows].copy()
+            for col in object_cols:
+                chunk[col] = chunk[col].map(lambda v: None if v is None or v is pd.NA else str(v))
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def xlsx_value(value):
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def write_xlsx(df: pd.DataFrame, out: BinaryIO, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    from openpyxl import Workbook
+
+    # write_only streams rows to disk instead of keeping a cell object per value
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Results")
+    sheet.append([str(col) for col in df.columns])
+    for start in range(0, len(df), chunk_rows):
+        for row in df.iloc[start:start + chunk_rows].itertuples(index=False, name=None):
+            sheet.append([xlsx_value(v) for v in row])
+    workbook.save(out)
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "xlsx": write_xlsx}
+
+
+def export_plan(fmt: str, base_name: str = "scraped_data", rows: int = 0, size: int = 0):
+    """
+    File name, mime type and whether to gzip, decided before the export is
+    built (a download button needs its file name up front). Text formats
+    are compressed past EXPORT_COMPRESS_ROWS rows or EXPORT_COMPRESS_BYTES bytes.
+    """
+    mime, compressible = EXPORT_FORMATS[fmt]
+    compress = compressible and (rows > EXPORT_COMPRESS_ROWS or size > EXPORT_COMPRESS_BYTES)
+    file_name = f"{base_name}.{fmt}"
+    return (file_name + ".gz", "application/gzip", True) if compress else (file_name, mime, False)
+
+
+def build_export(fmt: str, source, compress: bool = False) -> BinaryIO:
+    """
+    Writes the export to an anonymous temp file, chunk by chunk, and returns
+    it rewound for reading. `source` is a DataFrame for csv/parquet/xlsx; for
+    jsonl it is a JsonlSpool path or an iterable of records.
+    """
+    out = tempfile.TemporaryFile()
+    target = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6) if compress else out
+    if fmt == "jsonl":
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                shutil.copyfileobj(f, target)
+        else:
+            write_jsonl(source, target)
+    else:
+        WRITERS[fmt](source, target)
+    if compress:
+        target.close()
+    out.seek(0)
+    return out
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from assets import JOB_WORKERS, JOB_HISTORY
+from api_management import job_credentials
+from exporter import JsonlSpool
+from pipeline import iter_scrape
+from run_manifest import run_manifest, run_key
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class ScrapeJob:
+    """
+    One submitted scrape: its inputs, status, and the per-article results
+    received so far. Written by the worker thread, read by any number of
+    Streamlit reruns through snapshot().
+    """
+
+    def __init__(self, urls: List[str], fields: List[str], model: str, abm_context: str = "", abm_summary: str = "",
+                 credentials: dict = None, owner: str = None):
+        self.id = uuid.uuid4().hex[:12]
+        # Session that submitted the job; only it lists and controls the job
+        self.owner = owner
+        self.urls = list(urls)
+        self.fields = list(fields)
+        self.model = model
+        self.abm_context = abm_context
+        self.abm_summary = abm_summary
+        # Sidebar keys the job was submitted with; set as job_credentials in its worker thread
+        self.credentials = dict(credentials or {})
+        self.run_id = run_key(self.urls, model, self.fields, abm_context)
+        self.status = QUEUED
+        self.error = ""
+        self.resumed = {}
+        self.results = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Results are spooled to JSONL as they arrive; the JSON export just streams this file
+        self.spool = JsonlSpool()
+        self.cancel_requested = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def set_status(self, status: str, error: str = ""):
+        with self._lock:
+            self.status = status
+            self.error = error or self.error
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in FINISHED:
+                self.finished_at = time.time()
+                self.spool.close()
+
+    def add(self, result: dict):
+        record = {"unique_name": result["unique_name"], "parsed_data": result["parsed_data"]}
+        with self._lock:
+            self.results.append(record)
+            self.input_tokens += result["input_tokens"]
+            self.output_tokens += result["output_tokens"]
+            self.cost += result["cost"]
+            self.spool.append(record)
+
+    def snapshot(self) -> dict:
+        """Consistent copy of the job's state for rendering."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "resumed": dict(self.resumed),
+                "total": len(self.urls),
+                "data": list(self.results),
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_cost": self.cost,
+                "abm_summary": self.abm_summary,
+                "model": self.model,
+                "export_path": self.spool.path,
+                "elapsed": (self.finished_at or time.time()) - (self.started_at or time.time()),
+            }
+
+
+class JobManager:
+    """
+    Runs scrape jobs on a small thread pool, outside the Streamlit script
+    run: the UI submits a job and polls its snapshot, so it stays responsive
+    and a rerun (or a closed tab) does not interrupt the scrape. Jobs run
+    side by side, each through its own streaming pipeline and crawler pool,
+    checkpointed in the run manifest. The job table is process-wide and
+    keeps the last `history` finished jobs, but each job belongs to the
+    session that submitted it: given an `owner`, lookups only see that
+    session's jobs.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scrape-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, urls: List[str], fields: List[str], model: str, abm_context: str = "",
+               abm_summary: str = "", credentials: dict = None, owner: str = None) -> ScrapeJob:
+        """
+        Queues a scrape and returns its job right away. An identical job
+        (same URLs, model, fields and ABM context) from the same owner that
+        is still queued or running is returned instead of starting a duplicate.
+
+        `credentials` ({env var name: value}, see session_credentials) are
+        the API keys and Supabase settings the job runs with.
+        """
+        job = ScrapeJob(urls, fields, model, abm_context, abm_summary, credentials, owner)
+        with self._lock:
+            for other in self._jobs.values():
+                if other.run_id == job.run_id and other.owner == owner and not other.finished:
+                    job.spool.close()
+                    os.remove(job.spool.path)
+                    return other
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        print(f"[jobs] Submitted job {job.id}: {len(job.urls)} URLs with {model}")
+        return job
+
+    def get(self, job_id: str, owner: str = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def list(self, owner: str = None) -> List[ScrapeJob]:
+        """The owner's jobs (all known jobs without one), newest first."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if owner is None or job.owner == owner]
+        return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+    def cancel(self, job_id: str, owner: str = None):
+        """Stops a job, abandoning the articles in progress; its checkpoints are kept, so resubmitting it resumes."""
+        job = self.get(job_id, owner)
+        if job is not None and not job.finished:
+            job.cancel_requested.set()
+            if job.status == QUEUED:
+                job.set_status(CANCELLED)
+
+    def remove(self, job_id: str, owner: str = None):
+        """Cancels the job if needed and forgets it, deleting its spooled results."""
+        if self.get(job_id, owner) is None:
+            return
+        self.cancel(job_id)
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None and job.finished and os.path.exists(job.spool.path):
+            os.remove(job.spool.path)
+
+    def _prune(self):
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.submitted_at)
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+            if os.path.exists(job.spool.path):
+                os.remove(job.spool.path)
+
+    def _run(self, job: ScrapeJob):
+        if job.cancel_requested.is_set():
+            job.set_status(CANCELLED)
+            return
+        token = job_credentials.set(job.credentials)
+        try:
+            self._scrape(job)
+        finally:
+            job_credentials.reset(token)
+
+    def _scrape(self, job: ScrapeJob):
+        job.resumed = run_manifest.start(job.run_id)
+        job.set_status(RUNNING)
+        results = iter_scrape(job.urls, job.fields, job.model, job.abm_context, stop_event=job.cancel_requested,
+                              run_id=job.run_id)
+        try:
+            for result in results:
+                job.add(result)
+                if job.cancel_requested.is_set():
+                    break
+            if job.cancel_requested.is_set():
+                job.set_status(CANCELLED)
+            else:
+                run_manifest.finish(job.run_id)
+                job.set_status(DONE)
+        except Exception as e:
+            print(f"[jobs] Job {job.id} failed: {e}")
+            job.set_status(FAILED, str(e))
+        finally:
+            results.close()
+            if self.get(job.id) is None and os.path.exists(job.spool.path):
+                os.remove(job.spool.path)  # removed while it was running
+        print(f"[jobs] Job {job.id} {job.status}: {len(job.results)} articles")
+
+
+job_manager = JobManager()
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from assets import LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_MB
+
+EVICT_EVERY_N_WRITES = 50
+
+
+class LLMCache:
+    """
+    Persistent, content-addressed cache of LLM responses in a local SQLite file.
+
+    Keys are a SHA-256 over the model, the full message list, the response
+    schema (if any) and extra call parameters, so any change to a prompt, the
+    ABM context or the requested fields is a miss. Entries expire after
+    `ttl_seconds`; when the file grows past `max_mb` the least recently used
+    entries are dropped.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 max_mb: float = LLM_CACHE_MAX_MB):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.enabled = True  # switch off process-wide, e.g. to measure run-to-run variance
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT,
+                    size INTEGER,
+                    created_at REAL,
+                    accessed_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, messages: list, schema=None, **params) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "schema": schema, "params": params},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, model: str, response: dict):
+        data = json.dumps(response, default=str)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, data, len(data), now, now)
+            )
+            conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY_N_WRITES == 1:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        if self.ttl_seconds:
+            cur = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self.evictions += cur.rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at"):
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+            self.evictions += len(victims)
+        conn.commit()
+
+    def evict(self):
+        with self._lock:
+            self._evict(self._connect())
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "size_mb": round(size / (1024 * 1024), 2),
+            "evictions": self.evictions,
+        }
+
+
+llm_cache = LLMCache()
@@ -1,8 +1,11 @@
 import json
-from litellm import completion
-from assets import MODELS_USED
-from api_management import get_api_key
-import os
+from concurrent.futures import ThreadPoolExecutor
+from llm_scheduler import scheduled_completion
+from assets import CHUNK_EXTRACT_CONCURRENCY
+from api_management import with_credentials
+from chunking import split_markdown
+from abm_retrieval import relevant_abm_context
+from utils import normalize_company_name
 
 # Utility to normalize keys to lowercase with underscores
 def normalize_keys(obj):
@@ -25,12 +28,6 @@ def call_llm_model(data, model, system_message, response_format=None, abm_contex
         (parsed_data, token_info, cost)
     """
 
-    # Set API key from MODELS_USED
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     # Build chat prompt
     messages = [
         {"role": "system", "content": system_message},
@@ -39,12 +36,14 @@ def call_llm_model(data, model, system_message, response_format=None, abm_contex
     if abm_context:
         messages.insert(1, {
             "role": "system",
-            "content": f"ABM Context:\n{abm_context[:4000]}"
+            "content": f"ABM Context:\n{relevant_abm_context(abm_context, data)}"
         })
 
+    # Call the model (waits for the model's rate budget, backs off on rate limits)
+    schema = response_format.model_json_schema() if response_format else None
+    response = scheduled_completion(model=model, messages=messages, schema=schema)
+
     try:
-        # Call the model
-        response = completion(model=model, messages=messages)
         raw_content = response.choices[0].message.content.strip("` \n")
 
         # Strip leading ```json if present
@@ -89,3 +88,86 @@ def call_llm_model(data, model, system_message, response_format=None, abm_contex
         print(f" JSON parsing failed: {e}")
         print("🛠️ Raw model output:\n", response.choices[0].message.content)
         return {"raw_text": response.choices[0].message.content}, {"input_tokens": 0, "output_tokens": 0}, 0
+
+
+def is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+def merge_listing(target: dict, listing: dict):
+    """Fills empty fields of `target` from `listing`; list fields are unioned."""
+    for key, value in listing.items():
+        if is_empty(target.get(key)):
+            target[key] = value
+        elif isinstance(target[key], list) and isinstance(value, list):
+            target[key] = target[key] + [v for v in value if v not in target[key]]
+
+def merge_chunk_results(results):
+    """
+    Reduce step: concatenates the listings of every chunk, merging listings
+    that name the same company (compared by normalized name). Other top-level
+    fields take the first non-empty value.
+    """
+    merged = {}
+    listings = []
+    by_company = {}
+    for result in results:
+        for key, value in result.items():
+            if key != "listings" and is_empty(merged.get(key)):
+                merged[key] = value
+        for listing in result.get("listings") or []:
+            name = normalize_company_name(listing.get("company"))
+            if name and name in by_company:
+                merge_listing(by_company[name], listing)
+                continue
+            listing = dict(listing)
+            listings.append(listing)
+            if name:
+                by_company[name] = listing
+    merged["listings"] = listings
+    return merged
+
+def call_llm_model_chunked(data, model, system_message, response_format=None, abm_context="",
+                           max_tokens: int = None, max_workers: int = CHUNK_EXTRACT_CONCURRENCY):
+    """
+    Same contract as call_llm_model, but pages longer than the model's chunk
+    budget are split on heading/article boundaries, extracted chunk by chunk
+    in parallel (map) and merged with companies deduplicated (reduce).
+    Pages that fit in one chunk make exactly the same single call as before.
+
+    Returns:
+        (parsed_data, token_info, cost)
+    """
+    chunks = split_markdown(data, model, max_tokens)
+    if len(chunks) == 1:
+        return call_llm_model(data, model, system_message, response_format, abm_context)
+
+    print(f"[llm_calls] Page split into {len(chunks)} chunks for {model}")
+
+    def extract(chunk):
+        return call_llm_model(chunk, model, system_message, response_format, abm_context)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        outcomes = list(executor.map(with_credentials(extract), chunks))
+
+    results = []
+    token_counts = {"input_tokens": 0, "output_tokens": 0}
+    cost = 0
+    for parsed, chunk_tokens, chunk_cost in outcomes:
+        token_counts["input_tokens"] += chunk_tokens["input_tokens"]
+        token_counts["output_tokens"] += chunk_tokens["output_tokens"]
+        cost += chunk_cost
+        if hasattr(parsed, "model_dump"):
+            parsed = parsed.model_dump()
+        if isinstance(parsed, dict) and "raw_text" not in parsed:
+            results.append(parsed)
+
+    if not results:
+        return {"raw_text": ""}, token_counts, cost
+
+    merged = merge_chunk_results(results)
+    try:
+        parsed_response = response_format.model_validate(merged) if response_format else merged
+    except Exception as e:
+        print(f" Merged chunk validation failed: {e}")
+        parsed_response = merged
+    return parsed_response, token_counts, cost
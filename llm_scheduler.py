@@ -0,0 +1,189 @@
+import random
+import threading
+import time
+from collections import deque
+from litellm import completion, token_counter, ModelResponse, Usage
+from litellm.exceptions import RateLimitError
+from assets import MODELS_USED, MODEL_RATE_LIMITS, DEFAULT_RATE_LIMIT, LLM_MAX_RETRIES, LLM_CACHE_ENABLED
+from llm_cache import llm_cache
+from api_management import get_api_key
+
+WINDOW_SECONDS = 60.0
+
+
+class ModelBudget:
+    """Sliding one-minute window of requests and tokens for one model."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.scale = 1.0  # fraction of the configured quota we currently allow ourselves
+        self.window = deque()  # [timestamp, tokens] per request
+        self.blocked_until = 0.0
+        self.consecutive_limits = 0
+        self.requests = 0
+        self.tokens = 0
+        self.rate_limits = 0
+        self.waited_seconds = 0.0
+
+    def prune(self, now: float):
+        while self.window and now - self.window[0][0] >= WINDOW_SECONDS:
+            self.window.popleft()
+
+    def wait_time(self, now: float, tokens: int) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if not self.window:
+            return 0.0
+
+        rpm_allowed = max(1, int(self.rpm * self.scale))
+        if len(self.window) >= rpm_allowed:
+            return self.window[len(self.window) - rpm_allowed][0] + WINDOW_SECONDS - now
+
+        tpm_allowed = max(1, int(self.tpm * self.scale))
+        used = sum(entry[1] for entry in self.window)
+        if used + tokens <= tpm_allowed:
+            return 0.0
+        # Wait until enough of the oldest requests leave the window
+        for ts, entry_tokens in self.window:
+            used -= entry_tokens
+            if used + tokens <= tpm_allowed:
+                return ts + WINDOW_SECONDS - now
+        return self.window[-1][0] + WINDOW_SECONDS - now
+
+
+class RateLimitScheduler:
+    """
+    Thread-safe admission control for LLM calls.
+
+    Each call reserves an estimated number of tokens against its model's
+    requests-per-minute and tokens-per-minute budget and blocks until the
+    reservation fits. When the provider still answers with a RateLimitError,
+    the model's allowed share of its quota is halved and the model is paused
+    (Retry-After if given, otherwise exponential backoff with jitter). Every
+    successful call wins back a little of the quota, so throughput settles
+    just under the real provider limit.
+    """
+
+    def __init__(self, limits: dict = None):
+        self.limits = limits if limits is not None else MODEL_RATE_LIMITS
+        self._budgets = {}
+        self._cond = threading.Condition()
+
+    def _budget(self, model: str) -> ModelBudget:
+        if model not in self._budgets:
+            limit = self.limits.get(model, DEFAULT_RATE_LIMIT)
+            self._budgets[model] = ModelBudget(limit["rpm"], limit["tpm"])
+        return self._budgets[model]
+
+    def acquire(self, model: str, tokens: int) -> list:
+        with self._cond:
+            budget = self._budget(model)
+            while True:
+                now = time.monotonic()
+                budget.prune(now)
+                wait = budget.wait_time(now, tokens)
+                if wait <= 0:
+                    ticket = [now, tokens]
+                    budget.window.append(ticket)
+                    return ticket
+                budget.waited_seconds += wait
+                self._cond.wait(timeout=wait)
+
+    def settle(self, model: str, ticket: list, tokens: int):
+        """Replaces the estimate with the real token usage of a successful call."""
+        with self._cond:
+            budget = self._budget(model)
+            ticket[1] = tokens
+            budget.requests += 1
+            budget.tokens += tokens
+            budget.consecutive_limits = 0
+            budget.scale = min(1.0, budget.scale + 0.05)
+            self._cond.notify_all()
+
+    def on_rate_limit(self, model: str, retry_after: float = None) -> float:
+        with self._cond:
+            budget = self._budget(model)
+            budget.rate_limits += 1
+            budget.consecutive_limits += 1
+            budget.scale = max(0.1, budget.scale * 0.5)
+            delay = retry_after or min(60.0, 2 ** budget.consecutive_limits + random.random())
+            budget.blocked_until = max(budget.blocked_until, time.monotonic() + delay)
+            return delay
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                model: {
+                    "requests": b.requests,
+                    "tokens": b.tokens,
+                    "rate_limits": b.rate_limits,
+                    "quota_share": round(b.scale, 2),
+                    "waited_seconds": round(b.waited_seconds, 2),
+                }
+                for model, b in self._budgets.items()
+            }
+
+
+scheduler = RateLimitScheduler()
+
+
+def estimate_tokens(model: str, messages: list) -> int:
+    try:
+        return token_counter(model=model, messages=messages)
+    except Exception:
+        return sum(len(str(m.get("content", ""))) for m in messages) // 4
+
+
+def get_retry_after(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def scheduled_completion(model: str, messages: list, max_retries: int = LLM_MAX_RETRIES,
+                         schema=None, cache: bool = LLM_CACHE_ENABLED, **kwargs):
+    """
+    Drop-in for litellm.completion that waits for the model's rate budget and
+    retries RateLimitError with adaptive backoff. Re-raises after max_retries.
+
+    Responses are served from / stored in the local LLM cache, keyed on the
+    model, messages, `schema` and extra kwargs. A cached response costs
+    nothing, so its usage is reported as zero tokens.
+    """
+    key = llm_cache.make_key(model, messages, schema, **kwargs) if cache and llm_cache.enabled else None
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            response = ModelResponse(**cached)
+            response.usage = Usage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+            return response
+
+    # The key is passed explicitly (not via os.environ) so concurrent jobs
+    # submitted with different sidebar keys each use their own
+    if model in MODELS_USED:
+        kwargs.setdefault("api_key", get_api_key(model))
+
+    estimate = estimate_tokens(model, messages)
+    for attempt in range(max_retries + 1):
+        ticket = scheduler.acquire(model, estimate)
+        try:
+            response = completion(model=model, messages=messages, **kwargs)
+        except RateLimitError as e:
+            delay = scheduler.on_rate_limit(model, get_retry_after(e))
+            if attempt == max_retries:
+                raise
+            print(f"[llm_scheduler] Rate limit hit for {model}, backing off {delay:.1f}s (attempt {attempt + 1})")
+            continue
+
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None) or estimate
+        scheduler.settle(model, ticket, used)
+        if key:
+            try:
+                llm_cache.set(key, model, response.model_dump())
+            except Exception as e:
+                print(f"[llm_scheduler] Could not cache response: {e}")
+        return response
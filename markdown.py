@@ -1,73 +1,250 @@
 import asyncio
 import hashlib
-from typing import List
-from api_management import get_supabase_client
-from crawl4ai import AsyncWebCrawler
-from markdown_io import save_raw_data
+from typing import List, Tuple
+from urllib.parse import urlparse
+import httpx
+from assets import CRAWLER_POOL_SIZE, FETCH_CONCURRENCY, FETCH_PER_HOST_CONCURRENCY
+from crawler_pool import CrawlerPool
+from markdown_io import read_raw_data, read_raw_data_bulk, save_raw_data, save_raw_data_bulk, save_raw_pages, save_raw_pages_bulk
+from raw_pages import join_pages
+from page_index import page_index, content_hash, probe_unchanged
 from pagination import paginate_urls
-from utils import generate_unique_name
+from run_manifest import run_manifest, reached
+from utils import content_unique_name
 
-supabase = get_supabase_client()
+async def get_fit_markdown_async(url: str, pool: CrawlerPool = None) -> str:
+    if pool is not None:
+        return await pool.fetch_markdown(url)
+    async with CrawlerPool(size=1) as single:
+        return await single.fetch_markdown(url)
 
-async def get_fit_markdown_async(url: str) -> str:
-    async with AsyncWebCrawler() as crawler:
-        result = await crawler.arun(url=url)
-        return result.markdown if result.success else ""
-
-def fetch_fit_markdown(url: str) -> str:
+def run_async(coro):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        return loop.run_until_complete(get_fit_markdown_async(url))
+        return loop.run_until_complete(coro)
     finally:
         loop.close()
 
+def fetch_fit_markdown(url: str) -> str:
+    return run_async(get_fit_markdown_async(url))
+
 def deterministic_name(url: str) -> str:
     return hashlib.md5(url.encode()).hexdigest()
 
-def fetch_and_store_markdowns(urls: List[str], selected_model="gpt-4o", abm_context="") -> List[str]:
-    unique_names = []
-    url_name_map = {}
+def normalize_url(url: str) -> str:
+    return url.split("#")[0].rstrip("/")
+
+def get_page_urls(pagination_data) -> List[str]:
+    if isinstance(pagination_data, dict):
+        return pagination_data.get("page_urls", []) or []
+    return getattr(pagination_data, "page_urls", []) or []
+
+def other_pages(seed_url: str, page_urls: List[str]) -> List[str]:
+    """Page URLs still to fetch: the seed itself (page one) was fetched already."""
+    return [page_url for page_url in page_urls if normalize_url(page_url) != seed_url]
+
+class FetchLimiter:
+    """Global and per-host concurrency caps, shareable across several fetch_many calls."""
+
+    def __init__(self, max_concurrency: int = FETCH_CONCURRENCY, per_host: int = FETCH_PER_HOST_CONCURRENCY):
+        self.global_slots = asyncio.Semaphore(max(1, max_concurrency))
+        self.per_host = max(1, per_host)
+        self.host_slots = {}
+
+    def for_host(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        return self.host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+
+async def fetch_limited(url: str, pool: CrawlerPool, limiter: FetchLimiter):
+    """
+    Returns:
+        (markdown, response_headers) — ("", {}) when the fetch fails
+    """
+    # Take the host slot first so URLs queued behind a busy host don't hold global slots
+    async with limiter.for_host(url):
+        async with limiter.global_slots:
+            try:
+                return await pool.fetch_page(url)
+            except Exception as e:
+                print(f"[markdown] Error fetching {url}: {e}")
+                return "", {}
+
+async def fetch_many(urls: List[str], pool: CrawlerPool,
+                     max_concurrency: int = FETCH_CONCURRENCY,
+                     per_host: int = FETCH_PER_HOST_CONCURRENCY,
+                     limiter: FetchLimiter = None) -> List[str]:
+    """
+    Fetches markdown for all `urls` with at most `max_concurrency` requests in
+    flight overall and `per_host` per host. Results come back in input order;
+    a URL that fails yields "".
+    """
+    limiter = limiter or FetchLimiter(max_concurrency, per_host)
+    pages = await asyncio.gather(*(fetch_limited(url, pool, limiter) for url in urls))
+    return [markdown for markdown, _ in pages]
+
+async def fetch_if_changed(url: str, pool: CrawlerPool, limiter: FetchLimiter, client: httpx.AsyncClient):
+    """
+    Fetches a normalized seed URL unless the freshness index shows it is unchanged.
+
+    A 304 on a conditional HEAD skips the crawl entirely; otherwise the page is
+    crawled and its markdown hash compared with the stored one. Unchanged pages
+    keep the unique_name they were stored under; changed ones get a name
+    derived from their content, so a restarted run stores them under the same name.
 
-    def normalize_url(url: str) -> str:
-        return url.split("#")[0].rstrip("/")
+    Returns:
+        (unique_name, markdown, response_headers, changed) — markdown is "" when the crawl was skipped
+    """
+    entry = page_index.get(url)
+    if entry and await probe_unchanged(client, url, entry):
+        page_index.touch(url)
+        print(f"[markdown] Not modified (304), skipping {url}")
+        return entry["unique_name"], "", {}, False
 
-    for url in urls:
-        url = normalize_url(url)  # ✅ Normalize early
-        unique_name = generate_unique_name(url)
-        unique_names.append(unique_name)
-        url_name_map[unique_name] = url
+    raw_md, headers = await fetch_limited(url, pool, limiter)
+    if entry and raw_md and entry["content_hash"] == content_hash(raw_md):
+        page_index.touch(url)
+        print(f"[markdown] Content unchanged, skipping {url}")
+        return entry["unique_name"], raw_md, headers, False
+
+    return content_unique_name(url, raw_md), raw_md, headers, True
+
+async def fetch_and_store_seed(url: str, pool: CrawlerPool, limiter: FetchLimiter, client: httpx.AsyncClient,
+                               selected_model="gpt-4o", abm_context="", run_id: str = None) -> Tuple[str, str, str, bool]:
+    """
+    Fetches one seed URL, follows its pagination and stores the result.
+    Used by the streaming pipeline, which hands each seed to extraction as soon as it is done.
+    Unchanged seeds are neither paginated nor stored again. With a run_id, a
+    seed the run manifest has already fetched is not crawled again, and one
+    it has already paginated is handed straight to extraction.
+
+    Returns:
+        (unique_name, url, markdown, changed) — markdown is "" when it has to be read back from storage
+    """
+    url = normalize_url(url)
+    resume = run_manifest.get(run_id, url)
+    if reached(resume, "paginated"):
+        print(f"[markdown] Resuming {url}: already fetched and paginated")
+        return resume["unique_name"], url, "", False
+
+    if resume:
+        print(f"[markdown] Resuming {url}: already fetched, paginating")
+        unique_name, raw_md = resume["unique_name"], ""
+    else:
+        unique_name, raw_md, headers, changed = await fetch_if_changed(url, pool, limiter, client)
+        if not changed:
+            run_manifest.record_seed(run_id, url, unique_name, "paginated")
+            return unique_name, url, raw_md, False
+
+        save_raw_data(unique_name, url, raw_md)
+        if not raw_md:
+            return unique_name, url, raw_md, True
+        page_index.record_fetch(url, unique_name, content_hash(raw_md), headers)
+        run_manifest.record_seed(run_id, url, unique_name)
+
+    _, _, _, pagination_results = await asyncio.to_thread(
+        paginate_urls, [unique_name], selected_model, "", [url], abm_context
+    )
+    page_urls = get_page_urls(pagination_results[0].get("pagination_data")) if pagination_results else []
+    to_fetch = other_pages(url, page_urls)
+    if to_fetch:
+        if not raw_md:
+            raw_md = await asyncio.to_thread(read_raw_data, unique_name)
+        fetched = dict(zip(to_fetch, await fetch_many(to_fetch, pool, limiter=limiter)))
+        page_markdowns = [fetched.get(page_url, raw_md) for page_url in page_urls]
+        save_raw_pages(unique_name, url, list(zip(page_urls, page_markdowns)))
+        raw_md = join_pages(page_markdowns)
+    run_manifest.advance(run_id, unique_name, "paginated")
+
+    return unique_name, url, raw_md, bool(raw_md)
+
+async def fetch_and_store_markdowns_async(urls: List[str], selected_model="gpt-4o", abm_context="",
+                                          pool_size: int = CRAWLER_POOL_SIZE,
+                                          max_concurrency: int = FETCH_CONCURRENCY,
+                                          per_host: int = FETCH_PER_HOST_CONCURRENCY,
+                                          run_id: str = None) -> List[str]:
+    """
+    Fetches, paginates and stores every seed URL. Seeds whose content has not
+    changed since the last run keep their previous unique_name and are skipped;
+    scrape_urls then reuses their stored formatted_data. With a run_id, seeds
+    the run manifest has already fetched skip the crawl, and seeds it has
+    already paginated skip pagination too.
+    """
+    seed_urls = list(dict.fromkeys(normalize_url(url) for url in urls))  # ✅ Normalize early
+    resumed = {url: row for url in seed_urls if (row := run_manifest.get(run_id, url))}
+    if resumed:
+        print(f"[markdown] Resuming {len(resumed)} of {len(seed_urls)} seed pages from the run manifest")
+
+    async with CrawlerPool(size=pool_size) as pool, httpx.AsyncClient() as client:
+        limiter = FetchLimiter(max_concurrency, per_host)
 
         # Step 1: Fetch raw markdown and save to Supabase BEFORE paginating
+        fetch_urls = [url for url in seed_urls if url not in resumed]
+        fetched = await asyncio.gather(*(fetch_if_changed(url, pool, limiter, client) for url in fetch_urls))
+        seeds = dict(zip(fetch_urls, fetched))
+        unique_names = [resumed[url]["unique_name"] if url in resumed else seeds[url][0] for url in seed_urls]
+        # Seeds fetched before an interruption still need pagination
+        url_name_map = {row["unique_name"]: url for url, row in resumed.items() if not reached(row, "paginated")}
+        changed_seeds = []
+        for url, (unique_name, raw_md, headers, changed) in seeds.items():
+            if changed:
+                url_name_map[unique_name] = url
+                changed_seeds.append((unique_name, url, raw_md, headers))
+            else:
+                run_manifest.record_seed(run_id, url, unique_name, "paginated")
         try:
-            raw_md = fetch_fit_markdown(url)
-            save_raw_data(unique_name, url, raw_md)
-            print(f"[DEBUG] Saved raw_data for {url}")
+            save_raw_data_bulk([(unique_name, url, raw_md) for unique_name, url, raw_md, _ in changed_seeds])
+            for unique_name, url, raw_md, headers in changed_seeds:
+                if raw_md:
+                    page_index.record_fetch(url, unique_name, content_hash(raw_md), headers)
+                    run_manifest.record_seed(run_id, url, unique_name)
+            print(f"[DEBUG] Saved raw_data for {len(changed_seeds)} seed pages")
         except Exception as e:
-            print(f"[ERROR] Could not fetch raw markdown for {url}: {e}")
-
-    # Step 2: Run pagination on the already saved content
-    _, _, _, pagination_results = paginate_urls(
-        unique_names=unique_names,
-        model=selected_model,
-        indication="",
-        urls=list(url_name_map.values()),
-        abm_context=abm_context
-    )
+            print(f"[ERROR] Could not save raw markdown: {e}")
+        print(f"[markdown] {len(changed_seeds)} of {len(fetch_urls)} fetched seed pages changed since the last run")
 
-    for result in pagination_results:
-        unique_name = result["unique_name"]
-        page_urls = getattr(result.pagination_data, "page_urls", []) if hasattr(result, "pagination_data") else []
+        # Step 2: Run pagination on the already saved content
+        _, _, _, pagination_results = paginate_urls(
+            unique_names=list(url_name_map.keys()),
+            model=selected_model,
+            indication="",
+            urls=list(url_name_map.values()),
+            abm_context=abm_context
+        )
 
+        # Step 3: Fetch every paginated page of every seed in one bounded batch;
+        # page one is the seed, whose markdown is already at hand
+        page_urls_by_name = {result["unique_name"]: get_page_urls(result.get("pagination_data"))
+                             for result in pagination_results}
+        page_jobs = [(unique_name, page_url) for unique_name, page_urls in page_urls_by_name.items()
+                     for page_url in other_pages(url_name_map[unique_name], page_urls)]
+        page_markdowns = await fetch_many([page_url for _, page_url in page_jobs], pool, limiter=limiter)
+        fetched = {job: md for job, md in zip(page_jobs, page_markdowns)}
 
-        combined_markdown = ""
-        for page_url in page_urls:
-            try:
-                md = fetch_fit_markdown(page_url)
-                combined_markdown += md + "\n\n"
-            except Exception as e:
-                print(f"[markdown] Error fetching page {page_url}: {e}")
+        seed_markdown = {unique_name: raw_md for unique_name, _, raw_md, _ in changed_seeds}
+        paginated = list(dict.fromkeys(unique_name for unique_name, _ in page_jobs))
+        missing = [unique_name for unique_name in paginated if not seed_markdown.get(unique_name)]
+        if missing:  # resumed seeds: read back what was stored before the interruption
+            seed_markdown.update(read_raw_data_bulk(missing))
+
+        # One compressed chunk per page; readers can stream or slice them later
+        pages_by_name = {
+            unique_name: [(page_url, fetched.get((unique_name, page_url), seed_markdown.get(unique_name, "")))
+                          for page_url in page_urls_by_name[unique_name]]
+            for unique_name in paginated
+        }
 
-        save_raw_data(unique_name, url=url_name_map[unique_name], raw_data=combined_markdown)
+        if pages_by_name:
+            save_raw_pages_bulk([(unique_name, url_name_map[unique_name], pages)
+                                 for unique_name, pages in pages_by_name.items()])
+        for unique_name in url_name_map:
+            run_manifest.advance(run_id, unique_name, "paginated")
 
+    print(f"[markdown] Crawler pool stats: {pool.report()}")
     return unique_names
+
+def fetch_and_store_markdowns(urls: List[str], selected_model="gpt-4o", abm_context="",
+                              pool_size: int = CRAWLER_POOL_SIZE,
+                              max_concurrency: int = FETCH_CONCURRENCY, run_id: str = None) -> List[str]:
+    return run_async(fetch_and_store_markdowns_async(
+        urls, selected_model, abm_context, pool_size=pool_size, max_concurrency=max_concurrency, run_id=run_id))
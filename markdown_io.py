@@ -1,36 +1,160 @@
-from typing import List
-from api_management import get_supabase_client
-supabase = get_supabase_client()
+import asyncio
+from typing import Dict, List, Tuple
+from urllib.parse import urljoin
+import httpx
+import lxml.html
+from lxml import etree
+from assets import PAGINATION_PROBE_WINDOW, SUPABASE_BATCH_SIZE
+from raw_pages import build_chunks, decompress, is_manifest, join_pages
+from storage import get_storage
+storage = get_storage()
+
+def chunked(items: List, size: int = SUPABASE_BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def save_raw_pages(unique_name: str, url: str, pages: List[Tuple[str, str]]):
+    """
+    Stores each crawled (page_url, markdown) as its own compressed chunk and a
+    manifest of the chunks in the raw_data column.
+    """
+    save_raw_pages_bulk([(unique_name, url, pages)])
+
+def save_raw_pages_bulk(items: List[Tuple[str, str, List[Tuple[str, str]]]]):
+    """items: (unique_name, url, pages) tuples; all chunks go out in one bulk upsert, then all manifests in another."""
+    rows, chunk_items = [], []
+    for unique_name, url, pages in items:
+        manifest, chunks = build_chunks(pages)
+        chunk_items.append((unique_name, chunks))
+        rows.append({"unique_name": unique_name, "url": url, "raw_data": manifest})
+    storage.write_chunks_many(chunk_items)
+    save_rows(rows)
+
+def iter_raw_pages(unique_name: str, indices: List[int] = None):
+    """
+    Yields (page_url, markdown) one page at a time, reading and decompressing
+    each chunk only when it is reached. Legacy plain-string raw_data is yielded as one page.
+    """
+    row = storage.read_rows([unique_name], ["url", "raw_data"]).get(unique_name)
+    if not row or not row["raw_data"]:
+        return
+    raw_data = row["raw_data"]
+    if not is_manifest(raw_data):
+        if indices is None or 0 in indices:
+            yield row["url"], raw_data
+        return
+    for entry in raw_data["chunks"]:
+        if indices is not None and entry["idx"] not in indices:
+            continue
+        for chunk in storage.read_chunks([unique_name], [entry["idx"]]).get(unique_name, []):
+            yield chunk["url"], decompress(chunk["codec"], chunk["data"])
+
+def read_raw_page(unique_name: str, index: int) -> str:
+    for _, markdown in iter_raw_pages(unique_name, [index]):
+        return markdown
+    return ""
 
 def read_raw_data(unique_name: str) -> str:
-    response = supabase.table("scraped_data").select("raw_data").eq("unique_name", unique_name).execute()
-    data = response.data
-    return data[0]["raw_data"] if data and len(data) > 0 else ""
+    return read_raw_data_bulk([unique_name]).get(unique_name, "")
+
+def read_formatted_data(unique_name: str):
+    row = storage.read_rows([unique_name], ["formatted_data"]).get(unique_name)
+    return row["formatted_data"] if row else None
 
 def save_raw_data(unique_name: str, url: str, raw_data: str):
-    supabase.table("scraped_data").upsert({
-        "unique_name": unique_name,
-        "url": url,
-        "raw_data": raw_data,
-    }).execute()
+    save_raw_pages(unique_name, url, [(url, raw_data)])
 
-import requests
-from bs4 import BeautifulSoup
+def read_rows(unique_names: List[str], columns: List[str]) -> Dict[str, dict]:
+    """Selected columns for many rows in as few requests as the backend allows. Keyed by unique_name."""
+    return storage.read_rows(unique_names, columns)
 
-def get_paginated_urls(base_url: str, max_pages: int = 5) -> List[str]:
-    urls = []
-    for page in range(1, max_pages + 1):
+def read_raw_data_bulk(unique_names: List[str]) -> Dict[str, str]:
+    """Full markdown per unique_name, all pages joined. Chunks of all rows come back in one read."""
+    rows = read_rows(unique_names, ["raw_data"])
+    chunked_names = [name for name, row in rows.items() if is_manifest(row["raw_data"])]
+    chunks = storage.read_chunks(chunked_names) if chunked_names else {}
+    result = {}
+    for name in unique_names:
+        if name not in rows:
+            continue
+        raw_data = rows[name]["raw_data"]
+        if is_manifest(raw_data):
+            result[name] = join_pages(decompress(c["codec"], c["data"]) for c in chunks.get(name, []))
+        else:
+            result[name] = raw_data or ""
+    return result
+
+def save_rows(rows: List[dict]):
+    """
+    Multi-row upsert on unique_name. Only the columns present in the rows are
+    written, so this doubles as a bulk column-selective update. All rows of one
+    call must carry the same set of columns.
+    """
+    storage.upsert_rows(rows)
+
+def save_raw_data_bulk(rows: List[Tuple[str, str, str]]):
+    """rows: (unique_name, url, raw_data) tuples"""
+    save_raw_pages_bulk([(name, url, [(url, raw)]) for name, url, raw in rows])
+
+def update_columns(unique_name: str, **columns):
+    """Updates only the given columns of one row."""
+    storage.update_columns(unique_name, columns)
+
+def extract_article_links(html: str, page_url: str) -> List[str]:
+    """Article links on a listing page, resolved to absolute URLs (lxml parser)."""
+    try:
+        doc = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return []
+    links = []
+    for href in doc.xpath("//a/@href"):
+        if '/20' in href and 'page' not in href:  # crude filter for article URLs
+            links.append(urljoin(page_url, href))
+    return links
+
+async def get_paginated_urls_async(base_url: str, max_pages: int = 5, window: int = PAGINATION_PROBE_WINDOW,
+                                   client: httpx.AsyncClient = None) -> List[str]:
+    """
+    Probes /page/1../page/N `window` pages at a time over a pooled HTTP client.
+    The first page that does not answer 200 ends the walk; pages of the same
+    window after it are discarded, matching the serial behaviour.
+    """
+    async def probe(page: int):
         page_url = f"{base_url.rstrip('/')}/page/{page}/"
         try:
-            response = requests.get(page_url, timeout=10)
-            if response.status_code != 200:
-                break
-            soup = BeautifulSoup(response.text, "html.parser")
-            article_links = [
-                a['href'] for a in soup.find_all("a", href=True)
-                if '/20' in a['href'] and 'page' not in a['href']  # crude filter for article URLs
-            ]
-            urls.extend(article_links)
-        except Exception as e:
+            response = await client.get(page_url, timeout=10, follow_redirects=True)
+        except httpx.HTTPError as e:
             print(f"[WARN] Failed to fetch {page_url}: {e}")
-    return list(set(urls))  # remove dupes
+            return []
+        if response.status_code != 200:
+            return None
+        return extract_article_links(response.text, page_url)
+
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(limits=httpx.Limits(max_connections=max(1, window)))
+    urls = []
+    try:
+        for first in range(1, max_pages + 1, window):
+            pages = range(first, min(first + window, max_pages + 1))
+            for links in await asyncio.gather(*(probe(page) for page in pages)):
+                if links is None:
+                    return list(dict.fromkeys(urls))
+                urls.extend(links)
+    finally:
+        if own_client:
+            await client.aclose()
+    return list(dict.fromkeys(urls))  # remove dupes, keep page order
+
+async def get_paginated_urls_many_async(base_urls: List[str], max_pages: int = 5) -> List[str]:
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=PAGINATION_PROBE_WINDOW * 2)) as client:
+        results = await asyncio.gather(*(
+            get_paginated_urls_async(base_url, max_pages, client=client) for base_url in base_urls
+        ))
+    return [url for urls in results for url in urls]
+
+def get_paginated_urls(base_url: str, max_pages: int = 5) -> List[str]:
+    return asyncio.run(get_paginated_urls_async(base_url, max_pages))
+
+def get_paginated_urls_many(base_urls: List[str], max_pages: int = 5) -> List[str]:
+    return asyncio.run(get_paginated_urls_many_async(base_urls, max_pages))
@@ -1,20 +1,166 @@
+import asyncio
 import os
-import requests
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+import httpx
 from api_management import get_api_key
+from assets import (
+    GNEWS_BASE_URL, GNEWS_TTL_SECONDS, GNEWS_MIN_INTERVAL, GNEWS_DAILY_QUOTA,
+    GNEWS_MAX_CONNECTIONS, GNEWS_BACKOFF_SECONDS, TIMEOUT_SETTINGS
+)
 
-def get_media_mentions(company_name: str) -> int:
+
+def mention_key(company_name: str) -> str:
+    return " ".join(str(company_name or "").lower().split())
+
+
+class MediaMentionService:
+    """
+    GNews media-mention counts (last 30 days) for companies.
+
+    Runs its own event loop on a background thread with one pooled
+    httpx.AsyncClient, so calls from any worker thread share connections,
+    the per-company TTL cache and the quota. Concurrent lookups of the same
+    company are coalesced into one request. Requests are spaced by
+    `min_interval`, capped at `daily_quota` per UTC day, and paused after a
+    429/403 answer; while throttled, the last known count (or 0) is returned.
+
+    `base_url` (or the GNEWS_BASE_URL env var) can point at a local fake
+    GNews server for testing.
+    """
+
+    def __init__(self, base_url: str = None, ttl_seconds: float = GNEWS_TTL_SECONDS,
+                 min_interval: float = GNEWS_MIN_INTERVAL, daily_quota: int = GNEWS_DAILY_QUOTA,
+                 max_connections: int = GNEWS_MAX_CONNECTIONS):
+        self.base_url = (base_url or os.getenv("GNEWS_BASE_URL", GNEWS_BASE_URL)).rstrip("/")
+        self.ttl_seconds = ttl_seconds
+        self.min_interval = min_interval
+        self.daily_quota = daily_quota
+        self.max_connections = max_connections
+        self.requests = 0
+        self.hits = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self._cache = {}
+        self._inflight = {}
+        self._next_request_at = 0.0
+        self._blocked_until = 0.0
+        self._quota_day = None
+        self._quota_used = 0
+        self._loop = None
+        self._client = None
+        self._pace_lock = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="media-mentions", daemon=True).start()
+        return self._loop
+
+    def _client_for_loop(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=TIMEOUT_SETTINGS["page_load"],
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            self._pace_lock = asyncio.Lock()
+        return self._client
+
+    def _quota_left(self) -> bool:
+        today = datetime.now(timezone.utc).date()
+        if today != self._quota_day:
+            self._quota_day, self._quota_used = today, 0
+        return self._quota_used < self.daily_quota
+
+    def _fallback(self, key: str) -> int:
+        self.throttled += 1
+        cached = self._cache.get(key)
+        return cached[0] if cached else 0
+
+    async def _fetch(self, key: str, company_name: str, api_key: str) -> int:
+        client = self._client_for_loop()
+        async with self._pace_lock:
+            now = time.monotonic()
+            if now < self._blocked_until or not self._quota_left():
+                return self._fallback(key)
+            if now < self._next_request_at:
+                await asyncio.sleep(self._next_request_at - now)
+            self._next_request_at = time.monotonic() + self.min_interval
+            self._quota_used += 1
+
+        since = (datetime.now(timezone.utc) - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        params = {"q": f'"{company_name}"', "lang": "en", "max": 100, "from": since, "token": api_key}
+        self.requests += 1
+        try:
+            response = await client.get(f"{self.base_url}/search", params=params)
+        except httpx.HTTPError as e:
+            print(f"[get_media_mentions] Error fetching data: {e}")
+            return self._fallback(key)
+
+        if response.status_code in (403, 429):
+            try:
+                delay = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                delay = GNEWS_BACKOFF_SECONDS
+            self._blocked_until = time.monotonic() + delay
+            print(f"[get_media_mentions] GNews quota hit ({response.status_code}), pausing lookups for {delay:.0f}s")
+            return self._fallback(key)
+        try:
+            response.raise_for_status()
+            count = min(len(response.json().get("articles", [])), 100)  # GNews free plan caps at 100
+        except Exception as e:
+            print(f"[get_media_mentions] Error fetching data: {e}")
+            return self._fallback(key)
+        self._cache[key] = (count, time.time())
+        return count
+
+    async def mentions(self, company_name: str, api_key: str) -> int:
+        """Must run on the service loop (see get_media_mentions / get_media_mentions_many)."""
+        key = mention_key(company_name)
+        if not key:
+            return 0
+        cached = self._cache.get(key)
+        if cached and time.time() - cached[1] < self.ttl_seconds:
+            self.hits += 1
+            return cached[0]
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await task
+        task = asyncio.ensure_future(self._fetch(key, company_name, api_key))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await task
+
+    async def _mentions_many(self, company_names: List[str], api_key: str) -> List[int]:
+        return await asyncio.gather(*(self.mentions(name, api_key) for name in company_names))
+
+    def lookup_many(self, company_names: List[str], api_key: str) -> Dict[str, int]:
+        future = asyncio.run_coroutine_threadsafe(self._mentions_many(company_names, api_key), self._ensure_loop())
+        return dict(zip(company_names, future.result()))
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "cache_hits": self.hits,
+                "coalesced": self.coalesced, "throttled": self.throttled}
+
+
+media_mentions = MediaMentionService()
+
+
+def get_media_mentions(company_name: str, api_key: str = None) -> int:
     """Returns number of media mentions in the last 30 days using GNews API"""
-    api_key = get_api_key("gnews")
-    if not api_key:
-        return 0
-
-    query = f'"{company_name}"'
-    url = f"https://gnews.io/api/v4/search?q={query}&lang=en&max=100&from=30d&token={api_key}"
-
-    try:
-        response = requests.get(url)
-        data = response.json()
-        return min(len(data.get("articles", [])), 100)  # GNews free plan caps at 100
-    except Exception as e:
-        print(f"[get_media_mentions] Error fetching data: {e}")
-        return 0
+    return get_media_mentions_many([company_name], api_key).get(company_name, 0)
+
+
+def get_media_mentions_many(company_names: List[str], api_key: str = None) -> Dict[str, int]:
+    """Media-mention counts for several companies, looked up concurrently; duplicates cost one request."""
+    api_key = api_key or get_api_key("GNEWS")
+    names = [name for name in dict.fromkeys(company_names) if name]
+    if not api_key or not names:
+        return {name: 0 for name in company_names}
+    return media_mentions.lookup_many(names, api_key)
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import httpx
+from assets import PAGE_INDEX_PATH, TIMEOUT_SETTINGS
+
+
+def content_hash(markdown: str) -> str:
+    return hashlib.sha256((markdown or "").encode("utf-8")).hexdigest()
+
+
+class PageIndex:
+    """
+    Freshness index for crawled pages, keyed by normalized URL.
+
+    For every URL it remembers the unique_name its content was stored under,
+    the ETag / Last-Modified validators the server sent, and a hash of the
+    markdown. It also records which content hash (and which extraction
+    settings) the stored formatted_data was produced from, so an unchanged
+    page can skip the crawl, the storage write and the LLM extraction.
+    """
+
+    def __init__(self, path: str = PAGE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_index (
+                    url TEXT PRIMARY KEY,
+                    unique_name TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    extracted_hash TEXT,
+                    extracted_signature TEXT,
+                    fetched_at REAL,
+                    checked_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_page_index_name ON page_index (unique_name)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, url: str):
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM page_index WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def record_fetch(self, url: str, unique_name: str, markdown_hash: str, headers: dict = None):
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("""
+                INSERT INTO page_index (url, unique_name, etag, last_modified, content_hash, fetched_at, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    unique_name = excluded.unique_name,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    fetched_at = excluded.fetched_at,
+                    checked_at = excluded.checked_at
+            """, (url, unique_name, headers.get("etag"), headers.get("last-modified"), markdown_hash, now, now))
+            conn.commit()
+
+    def touch(self, url: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE page_index SET checked_at = ? WHERE url = ?", (time.time(), url))
+            conn.commit()
+
+    def mark_extracted(self, unique_name: str, signature: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE page_index SET extracted_hash = content_hash, extracted_signature = ? WHERE unique_name = ?",
+                (signature, unique_name)
+            )
+            conn.commit()
+
+    def is_extracted(self, unique_name: str, signature: str) -> bool:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT content_hash, extracted_hash, extracted_signature FROM page_index WHERE unique_name = ?",
+                (unique_name,)
+            ).fetchone()
+        return bool(row) and row["extracted_hash"] == row["content_hash"] and row["extracted_signature"] == signature
+
+
+async def probe_unchanged(client: httpx.AsyncClient, url: str, entry: dict) -> bool:
+    """
+    Sends a conditional HEAD request with the stored validators.
+    True only when the server answers 304 Not Modified.
+    """
+    if not entry or not (entry.get("etag") or entry.get("last_modified")):
+        return False
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    try:
+        response = await client.head(url, headers=headers, follow_redirects=True,
+                                     timeout=TIMEOUT_SETTINGS["page_load"])
+        return response.status_code == 304
+    except httpx.HTTPError as e:
+        print(f"[page_index] Conditional check failed for {url}: {e}")
+        return False
+
+
+page_index = PageIndex()
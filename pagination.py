@@ -1,12 +1,14 @@
 import json
-from typing import List, Dict
-from assets import PROMPT_PAGINATION
-from markdown_io import read_raw_data, save_raw_data
-from api_management import get_supabase_client
+import re
+from math import gcd
+from functools import reduce
+from typing import List, Dict, Tuple
+from urllib.parse import urljoin, urlparse, parse_qsl, urlencode, urlunparse
+from assets import PROMPT_PAGINATION, PAGINATION_MAX_PAGES
+from markdown_io import read_raw_data_bulk, save_rows, update_columns
 from pydantic import BaseModel, create_model
 from llm_calls import call_llm_model
 
-supabase = get_supabase_client()
 
 class PaginationModel(BaseModel):
     page_urls: List[str]
@@ -25,7 +27,123 @@ def build_pagination_prompt(indications: str, url: str) -> str:
         prompt += "No special user indications. Apply general pagination logic.\n\n"
     return prompt
 
-def save_pagination_data(unique_name: str, pagination_data):
+MARKDOWN_LINK_RE = re.compile(r'\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+BARE_URL_RE = re.compile(r'(?<!\()https?://[^\s)>\]"]+')
+PAGE_SEGMENTS = {"page", "p", "pg", "seite", "pagina"}
+PAGE_PARAMS = {"page", "p", "pg", "paged", "pagenum", "page_num", "pageno"}
+OFFSET_PARAMS = {"offset", "start", "from", "skip"}
+CURSOR_PARAMS = {"cursor", "after", "before", "continue", "continuation", "token", "page_token", "pagetoken", "next"}
+LINK_TEXT_RE = re.compile(r'\[([^\]]*)\]\(')
+NEXT_LINK_RE = re.compile(r'\b(next|older|earlier|more (posts|articles|news|stories|results)|load more|show more)\b|[»›→]',
+                          re.IGNORECASE)
+
+def extract_links(markdown: str, base_url: str) -> List[str]:
+    """Absolute same-host links found in markdown link syntax or as bare URLs, in order of appearance."""
+    host = urlparse(base_url).netloc.lower()
+    links = []
+    for raw in MARKDOWN_LINK_RE.findall(markdown) + BARE_URL_RE.findall(markdown):
+        url = urljoin(base_url, raw.strip()).split("#")[0]
+        if urlparse(url).netloc.lower() == host:
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+def pagination_templates(url: str):
+    """
+    Yields (template, number, kind) for every numeric token of `url` that could be a page indicator.
+    `template` is the URL with that token replaced by "{n}"; kind is "page", "offset" or "generic".
+    """
+    parsed = urlparse(url)
+    segments = parsed.path.split("/")
+    for i, segment in enumerate(segments):
+        if not segment.isdigit():
+            continue
+        previous = segments[i - 1].lower() if i > 0 else ""
+        if previous in PAGE_SEGMENTS:
+            kind = "page"
+        elif i == len(segments) - 1 or (i == len(segments) - 2 and segments[-1] == ""):
+            # A trailing number right after a year segment is a date archive, not a page
+            if re.fullmatch(r"(19|20)\d\d", previous) or re.fullmatch(r"(19|20)\d\d", segment):
+                continue
+            kind = "generic"
+        else:
+            continue
+        template_path = "/".join(segments[:i] + ["{n}"] + segments[i + 1:])
+        yield urlunparse(parsed._replace(path=template_path)), int(segment), kind
+
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    for i, (key, value) in enumerate(query):
+        if not value.isdigit():
+            continue
+        if key.lower() in PAGE_PARAMS:
+            kind = "page"
+        elif key.lower() in OFFSET_PARAMS:
+            kind = "offset"
+        else:
+            continue
+        rest = [(k, v) for j, (k, v) in enumerate(query) if j != i]
+        template_query = urlencode(rest + [(key, "{n}")], safe="{}")
+        yield urlunparse(parsed._replace(query=template_query)), int(value), kind
+
+def has_pagination_cues(markdown: str, base_url: str) -> bool:
+    """
+    True when the page shows signs of pagination the numeric detector cannot
+    expand: next/older links, or same-host links with cursor or non-numeric
+    page/offset parameters.
+    """
+    # Only short anchors count, so a headline like "Next-gen robots ..." is not a next link
+    if any(len(text.split()) <= 3 and NEXT_LINK_RE.search(text) for text in LINK_TEXT_RE.findall(markdown)):
+        return True
+    for link in extract_links(markdown, base_url):
+        for key, value in parse_qsl(urlparse(link).query, keep_blank_values=True):
+            key = key.lower()
+            if key in CURSOR_PARAMS or (key in PAGE_PARAMS | OFFSET_PARAMS and not value.isdigit()):
+                return True
+    return False
+
+def detect_pagination(markdown: str, base_url: str, max_pages: int = PAGINATION_MAX_PAGES) -> Tuple[List[str], bool]:
+    """
+    Finds page links in the markdown and infers the numeric increment pattern
+    (/page/N, ?page=N, ?offset=N, or a trailing /N), then expands it into the
+    full sequence of page URLs, starting with `base_url` as page one.
+
+    A page without numbered links is confidently a single page only if it
+    has no other pagination cues (see has_pagination_cues); a single page
+    number link, which may be just the "next" page, is not confident either.
+
+    Returns:
+        (page_urls, confident) — when not confident, the caller should ask the LLM.
+    """
+    groups = {}
+    for link in extract_links(markdown, base_url):
+        for template, number, kind in pagination_templates(link):
+            groups.setdefault((template, kind), set()).add(number)
+
+    best = None
+    for (template, kind), numbers in groups.items():
+        numbers = sorted(numbers)
+        if kind == "generic":
+            steps = {b - a for a, b in zip(numbers, numbers[1:])}
+            # Bare trailing numbers only count as pages when there are several, consecutive, starting low
+            if len(numbers) < 3 or steps != {1} or numbers[0] > 2:
+                continue
+        score = (kind != "generic", len(numbers))
+        if best is None or score > best[0]:
+            best = (score, template, kind, numbers)
+
+    if best is None:
+        return [base_url], not has_pagination_cues(markdown, base_url)
+
+    _, template, kind, numbers = best
+    if kind == "offset":
+        step = reduce(gcd, numbers) or 1
+        sequence = range(step, max(numbers) + 1, step)
+    else:
+        sequence = range(2, max(numbers) + 1)
+
+    page_urls = [base_url] + [template.replace("{n}", str(n)) for n in sequence]
+    return page_urls[:max_pages], len(numbers) > 1
+
+def pagination_payload(pagination_data) -> dict:
     if hasattr(pagination_data, "dict"):
         pagination_data = pagination_data.dict()
     if isinstance(pagination_data, str):
@@ -33,41 +151,51 @@ def save_pagination_data(unique_name: str, pagination_data):
             pagination_data = json.loads(pagination_data)
         except json.JSONDecodeError:
             pagination_data = {"raw_text": pagination_data}
+    return pagination_data
 
-    # Preserve existing raw_data while updating pagination
-    raw_data = read_raw_data(unique_name)
-    save_raw_data(unique_name, url="", raw_data=raw_data)  # optional, depending on your schema
-
-    supabase.table("scraped_data").update({
-        "pagination_data": pagination_data
-    }).eq("unique_name", unique_name).execute()
-
+def save_pagination_data(unique_name: str, pagination_data):
+    update_columns(unique_name, pagination_data=pagination_payload(pagination_data))
     print(f"\033[35mINFO: Pagination data saved for {unique_name}\033[0m")
 
 def paginate_urls(unique_names: List[str], model: str, indication: str, urls: List[str], abm_context: str = ""):
+    """
+    Finds the pagination URLs of every page. The local detector handles the
+    common numeric patterns; only pages it is not confident about (or pages
+    with user indications) are sent to the LLM.
+    """
     total_input_tokens = 0
     total_output_tokens = 0
     total_cost = 0
     pagination_results = []
+    llm_calls_avoided = 0
+    pagination_rows = []
 
+    raw_by_name = read_raw_data_bulk(unique_names) if unique_names else {}
     for uniq, current_url in zip(unique_names, urls):
-        raw_data = read_raw_data(uniq)
+        raw_data = raw_by_name.get(uniq, "")
         if not raw_data:
             print(f"[WARN] No raw_data found for {uniq}, skipping pagination.")
             continue
 
-        prompt = build_pagination_prompt(indication, current_url)
-        schema = get_pagination_response_format()
-
-        pag_data, token_counts, cost = call_llm_model(
-            data=raw_data,
-            response_format=schema,
-            model=model,
-            system_message=prompt,
-            abm_context=abm_context
-        )
-
-        save_pagination_data(uniq, pag_data)
+        page_urls, confident = detect_pagination(raw_data, current_url)
+        if confident and not indication.strip():
+            pag_data, token_counts, cost = PaginationModel(page_urls=page_urls), {"input_tokens": 0, "output_tokens": 0}, 0
+            llm_calls_avoided += 1
+            source = "local"
+        else:
+            prompt = build_pagination_prompt(indication, current_url)
+            schema = get_pagination_response_format()
+
+            pag_data, token_counts, cost = call_llm_model(
+                data=raw_data,
+                response_format=schema,
+                model=model,
+                system_message=prompt,
+                abm_context=abm_context
+            )
+            source = "llm"
+
+        pagination_rows.append({"unique_name": uniq, "pagination_data": pagination_payload(pag_data)})
 
         total_input_tokens += token_counts["input_tokens"]
         total_output_tokens += token_counts["output_tokens"]
@@ -76,7 +204,14 @@ def paginate_urls(unique_names: List[str], model: str, indication: str, urls: Li
         pagination_results.append({
             "unique_name": uniq,
             "url": current_url,
-            "pagination_data": pag_data
+            "pagination_data": pag_data,
+            "source": source
         })
 
+    if pagination_rows:
+        save_rows(pagination_rows)
+        print(f"\033[35mINFO: Pagination data saved for {len(pagination_rows)} pages\033[0m")
+    if pagination_results:
+        print(f"[pagination] Local detector handled {llm_calls_avoided} of {len(pagination_results)} pages "
+              f"({llm_calls_avoided} LLM calls avoided)")
     return total_input_tokens, total_output_tokens, total_cost, pagination_results
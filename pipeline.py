@@ -0,0 +1,193 @@
+import asyncio
+import queue
+import threading
+from typing import List
+import httpx
+from assets import (
+    CRAWLER_POOL_SIZE, FETCH_CONCURRENCY, FETCH_PER_HOST_CONCURRENCY, PIPELINE_QUEUE_SIZE, EXTRACT_CONCURRENCY,
+    PIPELINE_STOP_POLL_SECONDS
+)
+from crawler_pool import CrawlerPool
+from markdown import FetchLimiter, fetch_and_store_seed, run_async
+from markdown_io import read_raw_data
+from scraper import build_listings_container_model, scrape_markdown, extraction_signature, load_unchanged_result
+from abm_docs import get_abm_report_text
+from run_manifest import run_manifest
+from api_management import with_credentials
+
+_DONE = object()
+
+
+async def stream_scrape(urls: List[str], fields: List[str], selected_model: str, abm_context: str = "",
+                        pool_size: int = CRAWLER_POOL_SIZE,
+                        max_concurrency: int = FETCH_CONCURRENCY,
+                        per_host: int = FETCH_PER_HOST_CONCURRENCY,
+                        extract_concurrency: int = EXTRACT_CONCURRENCY,
+                        queue_size: int = PIPELINE_QUEUE_SIZE,
+                        run_id: str = None,
+                        stop_event: threading.Event = None):
+    """
+    Producer/consumer version of fetch_and_store_markdowns -> scrape_urls.
+
+    Fetch workers crawl each seed (plus its pagination) and push the markdown
+    onto a bounded queue; extraction workers pull from it and run the LLM
+    extraction and enrichment. Results are yielded as soon as each article
+    is done, in completion order, as dicts shaped like scrape_urls' results
+    plus "url", "input_tokens", "output_tokens" and "cost".
+
+    Both queues are bounded, so a slow LLM stage applies back-pressure to the
+    crawler instead of piling up markdown in memory.
+
+    With a run_id (see run_manifest.run_key), every seed's progress is
+    checkpointed, and a restarted run skips the stages its seeds completed.
+
+    Setting stop_event stops the run within PIPELINE_STOP_POLL_SECONDS: no
+    new seed is fetched or extracted and the work in flight is cancelled.
+    """
+    if not abm_context:
+        abm_context = get_abm_report_text()
+    response_format = build_listings_container_model(fields)
+    signature = extraction_signature(response_format, selected_model)
+
+    seeds = iter(urls)
+    extract_queue = asyncio.Queue(maxsize=max(1, queue_size))
+    result_queue = asyncio.Queue(maxsize=max(1, queue_size))
+    fetch_workers = max(1, min(max_concurrency, len(urls)))
+    extract_workers = max(1, extract_concurrency)
+    stopped = stop_event.is_set if stop_event is not None else (lambda: False)
+
+    async with CrawlerPool(size=pool_size) as pool, httpx.AsyncClient() as client:
+        limiter = FetchLimiter(max_concurrency, per_host)
+
+        async def fetch_worker():
+            for url in seeds:
+                if stopped():
+                    return
+                try:
+                    item = await fetch_and_store_seed(url, pool, limiter, client, selected_model, abm_context,
+                                                      run_id)
+                except Exception as e:
+                    print(f"[pipeline] Fetch failed for {url}: {e}")
+                    continue
+                await extract_queue.put(item)
+
+        async def extract_worker():
+            while True:
+                item = await extract_queue.get()
+                if item is _DONE:
+                    return
+                if stopped():
+                    continue
+                unique_name, url, markdown, changed = item
+                try:
+                    reused = None if changed else await asyncio.to_thread(load_unchanged_result, unique_name, signature)
+                    if reused is not None:
+                        run_manifest.advance(run_id, unique_name, "scored")
+                        parsed, token_counts, cost = reused, {"input_tokens": 0, "output_tokens": 0}, 0
+                    else:
+                        if not changed:
+                            markdown = await asyncio.to_thread(read_raw_data, unique_name)
+                        if not markdown:
+                            print(f"\033[34mNo raw_data found for {unique_name}, skipping.\033[0m")
+                            continue
+                        parsed, token_counts, cost = await asyncio.to_thread(
+                            scrape_markdown, unique_name, markdown, response_format, selected_model, abm_context,
+                            run_id=run_id
+                        )
+                except Exception as e:
+                    print(f"[pipeline] Extraction failed for {url}: {e}")
+                    continue
+                await result_queue.put({
+                    "unique_name": unique_name,
+                    "url": url,
+                    "parsed_data": parsed,
+                    "input_tokens": token_counts["input_tokens"],
+                    "output_tokens": token_counts["output_tokens"],
+                    "cost": cost,
+                })
+
+        async def run_stages():
+            await asyncio.gather(*(fetch_worker() for _ in range(fetch_workers)))
+            for _ in range(extract_workers):
+                await extract_queue.put(_DONE)
+
+        async def drain():
+            await asyncio.gather(run_stages(), *(extract_worker() for _ in range(extract_workers)))
+            await result_queue.put(_DONE)
+
+        runner = asyncio.ensure_future(drain())
+        try:
+            while not stopped():
+                try:
+                    result = await asyncio.wait_for(result_queue.get(), timeout=PIPELINE_STOP_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    continue
+                if result is _DONE:
+                    await runner
+                    break
+                yield result
+        finally:
+            if not runner.done():
+                runner.cancel()
+                await asyncio.gather(runner, return_exceptions=True)
+
+    print(f"[pipeline] Crawler pool stats: {pool.report()}")
+
+
+def iter_scrape(urls: List[str], fields: List[str], selected_model: str, abm_context: str = "",
+                stop_event: threading.Event = None, **kwargs):
+    """
+    Synchronous wrapper around stream_scrape for callers without an event loop
+    (e.g. the Streamlit script). The pipeline runs on its own thread and loop;
+    results are handed over through a bounded queue.
+
+    Setting stop_event (or closing the generator) stops the pipeline, and
+    the generator returns once its thread has shut down.
+    """
+    handoff = queue.Queue(maxsize=max(1, kwargs.get("queue_size", PIPELINE_QUEUE_SIZE)))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def consume():
+        results = stream_scrape(urls, fields, selected_model, abm_context, stop_event=stop, **kwargs)
+        try:
+            async for result in results:
+                if not await asyncio.to_thread(put, result):
+                    break
+        finally:
+            await results.aclose()
+
+    def run():
+        try:
+            run_async(consume())
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=with_credentials(run), name="scrape-pipeline", daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                item = handoff.get(timeout=PIPELINE_STOP_POLL_SECONDS)
+            except queue.Empty:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,62 @@
+import hashlib
+import zlib
+from typing import List, Tuple
+from assets import RAW_CHUNK_CODEC, RAW_CHUNK_LEVEL
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback keeps the chunked format usable without the wheel
+    zstandard = None
+
+MANIFEST_FORMAT = "chunked/v1"
+PAGE_SEPARATOR = "\n\n"
+
+
+def compress(text: str, codec: str = RAW_CHUNK_CODEC) -> Tuple[str, bytes]:
+    data = text.encode("utf-8")
+    if codec == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=RAW_CHUNK_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("raw_data chunk is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    return data.decode("utf-8")
+
+
+def build_chunks(pages: List[Tuple[str, str]]):
+    """
+    Compresses each (page_url, markdown) pair into its own chunk.
+
+    Returns:
+        (manifest, chunks) — the manifest goes into the raw_data column, the
+        chunks into the raw_chunks table.
+    """
+    manifest = {"format": MANIFEST_FORMAT, "chunks": []}
+    chunks = []
+    for idx, (page_url, markdown) in enumerate(pages):
+        codec, data = compress(markdown or "")
+        chunks.append({"idx": idx, "url": page_url, "codec": codec, "data": data})
+        manifest["chunks"].append({
+            "idx": idx,
+            "url": page_url,
+            "codec": codec,
+            "size": len((markdown or "").encode("utf-8")),
+            "compressed_size": len(data),
+            "sha256": hashlib.sha256((markdown or "").encode("utf-8")).hexdigest(),
+        })
+    return manifest, chunks
+
+
+def is_manifest(raw_data) -> bool:
+    return isinstance(raw_data, dict) and raw_data.get("format") == MANIFEST_FORMAT
+
+
+def join_pages(markdowns) -> str:
+    """The single-string form readers of the legacy raw_data column expect."""
+    return "".join(md + PAGE_SEPARATOR for md in markdowns)
@@ -0,0 +1,83 @@
+import json
+import pandas as pd
+
+# Display priority columns first
+PRIORITY_COLUMNS = [
+    "Article Name", "Article Summary", "Article Date", "Article URL",
+    "Company", "Company Info", "Focus", "Region",
+    "Humanoid Robotics Use Case", "Single Use Cases", "Task Streamlining",
+    "Raised Funding", "Recent Developments", "Partnerships",
+    "Relevancy Score", "Correlation Reason"
+]
+
+
+def parsed_object(data_item):
+    parsed_obj = data_item.get("parsed_data", {})
+    if hasattr(parsed_obj, "model_dump"):
+        parsed_obj = parsed_obj.model_dump()
+    elif isinstance(parsed_obj, str):
+        try:
+            parsed_obj = json.loads(parsed_obj)
+        except json.JSONDecodeError:
+            parsed_obj = {}
+    return parsed_obj
+
+
+def iter_rows(all_data):
+    """One row per listing (with its article's summary), or the parsed object itself if it has no listings."""
+    for data_item in all_data:
+        if not isinstance(data_item, dict):
+            continue
+        parsed_obj = parsed_object(data_item)
+        if isinstance(parsed_obj, dict) and isinstance(parsed_obj.get("listings"), list):
+            article_summary = parsed_obj.get("article_summary", "")
+            for listing in parsed_obj["listings"]:
+                yield {**listing, "article_summary": article_summary or listing.get("article_summary", "")}
+        else:
+            yield parsed_obj
+
+
+def display_name(column) -> str:
+    return str(column).strip().replace("_", " ").title()
+
+
+def to_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    """Arrow-backed copy of the frame: one conversion here instead of on every st.dataframe call."""
+    converted = {}
+    for column in df.columns:
+        try:
+            converted[column] = df[column].convert_dtypes(dtype_backend="pyarrow")
+        except Exception:
+            # Mixed values (e.g. lists next to strings) stay as Python objects, shown as text
+            converted[column] = df[column].astype(str).where(df[column].notna())
+    return pd.DataFrame(converted, index=df.index)
+
+
+def build_results_frame(all_data) -> pd.DataFrame:
+    """
+    Flattens scrape results into the display frame, once: standardized column
+    names, empty strings as missing, duplicate columns dropped, a numeric
+    Relevancy Score, and priority columns first. Filtering the result is then
+    a single vectorized mask (see filter_by_relevancy).
+    """
+    df = pd.DataFrame.from_records(list(iter_rows(all_data)))
+    if df.empty:
+        return df
+
+    # Standardize column names and drop the duplicates that creates (e.g. company / Company)
+    df.columns = [display_name(col) for col in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
+    df = df.replace("", pd.NA)
+
+    if "Relevancy Score" in df.columns:
+        df["Relevancy Score"] = pd.to_numeric(df["Relevancy Score"], errors="coerce")
+
+    display_cols = [col for col in PRIORITY_COLUMNS if col in df.columns]
+    other_cols = [col for col in df.columns if col not in display_cols]
+    return to_arrow(df[display_cols + other_cols])
+
+
+def filter_by_relevancy(df: pd.DataFrame, min_score: int) -> pd.DataFrame:
+    if "Relevancy Score" not in df.columns:
+        return df
+    return df[(df["Relevancy Score"] >= min_score).fillna(False)]
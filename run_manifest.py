@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from assets import RUN_MANIFEST_PATH, RUN_MANIFEST_TTL_SECONDS
+
+# Stage order per seed URL; a URL at a stage has completed it and every stage before it
+STAGES = ("fetched", "paginated", "extracted", "enriched", "scored")
+
+
+def run_key(urls, model: str, fields, abm_context: str = "") -> str:
+    """
+    Stable id for a run: the same URLs, model, fields and ABM context map to
+    the same run, so restarting an interrupted run finds its checkpoints.
+    """
+    payload = json.dumps({
+        "urls": sorted({url.split("#")[0].rstrip("/") for url in urls}),
+        "model": model,
+        "fields": sorted(set(fields)),
+        "abm": hashlib.sha256((abm_context or "").encode("utf-8")).hexdigest(),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def reached(row, stage: str) -> bool:
+    return bool(row) and STAGES.index(row["stage"]) >= STAGES.index(stage)
+
+
+class RunManifest:
+    """
+    Per-run record of how far each seed URL got through the pipeline, keyed
+    by run id and normalized URL. Alongside the stage it keeps the URL's
+    unique_name (content-derived, so it is the same after a restart) and the
+    latest parsed result, so a restarted run re-crawls, re-paginates and
+    re-extracts only the URLs that had not finished that stage.
+
+    Every method is a no-op when run_id is None, so callers can pass it
+    through unconditionally.
+    """
+
+    def __init__(self, path: str = RUN_MANIFEST_PATH, ttl_seconds: float = RUN_MANIFEST_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    status TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS run_urls (
+                    run_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    unique_name TEXT,
+                    stage TEXT,
+                    checkpoint TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (run_id, url)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_run_urls_name ON run_urls (run_id, unique_name)")
+            self._conn.commit()
+        return self._conn
+
+    def start(self, run_id: str) -> dict:
+        """
+        Opens a run, resuming it if an unfinished one with this id is recent
+        enough; finished or stale runs start from scratch.
+
+        Returns:
+            {stage: URL count} already completed (empty for a fresh run)
+        """
+        if run_id is None:
+            return {}
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            cutoff = now - self.ttl_seconds
+            conn.execute("DELETE FROM run_urls WHERE run_id IN (SELECT run_id FROM runs WHERE updated_at < ?)", (cutoff,))
+            conn.execute("DELETE FROM runs WHERE updated_at < ?", (cutoff,))
+            row = conn.execute("SELECT status FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if row is not None and row["status"] == "done":
+                conn.execute("DELETE FROM run_urls WHERE run_id = ?", (run_id,))
+            conn.execute("""
+                INSERT INTO runs (run_id, status, created_at, updated_at) VALUES (?, 'running', ?, ?)
+                ON CONFLICT(run_id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at
+            """, (run_id, now, now))
+            conn.commit()
+            counts = conn.execute(
+                "SELECT stage, COUNT(*) FROM run_urls WHERE run_id = ? GROUP BY stage", (run_id,)
+            ).fetchall()
+        return {stage: count for stage, count in counts}
+
+    def finish(self, run_id: str):
+        if run_id is None:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE runs SET status = 'done', updated_at = ? WHERE run_id = ?", (time.time(), run_id))
+            conn.commit()
+
+    def get(self, run_id: str, url: str):
+        if run_id is None:
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT url, unique_name, stage FROM run_urls WHERE run_id = ? AND url = ?", (run_id, url)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def record_seed(self, run_id: str, url: str, unique_name: str, stage: str = "fetched"):
+        """Ties a seed URL to the unique_name its content was stored under."""
+        if run_id is None:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("""
+                INSERT INTO run_urls (run_id, url, unique_name, stage, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(run_id, url) DO UPDATE SET
+                    unique_name = excluded.unique_name,
+                    stage = excluded.stage,
+                    checkpoint = NULL,
+                    updated_at = excluded.updated_at
+            """, (run_id, url, unique_name, stage, now))
+            conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+            conn.commit()
+
+    def advance(self, run_id: str, unique_name: str, stage: str, checkpoint=None):
+        """
+        Moves the URL stored under `unique_name` forward to `stage` (never
+        back), optionally saving the parsed result reached at that stage.
+        """
+        if run_id is None:
+            return
+        data = json.dumps(checkpoint, default=str) if checkpoint is not None else None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT stage FROM run_urls WHERE run_id = ? AND unique_name = ?", (run_id, unique_name)
+            ).fetchone()
+            if row is None or STAGES.index(row["stage"]) > STAGES.index(stage):
+                return
+            conn.execute("""
+                UPDATE run_urls SET stage = ?, checkpoint = COALESCE(?, checkpoint), updated_at = ?
+                WHERE run_id = ? AND unique_name = ?
+            """, (stage, data, time.time(), run_id, unique_name))
+            conn.commit()
+
+    def checkpoint(self, run_id: str, unique_name: str):
+        """
+        Returns:
+            (stage, parsed result) saved for `unique_name`, or None
+        """
+        if run_id is None:
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT stage, checkpoint FROM run_urls WHERE run_id = ? AND unique_name = ?", (run_id, unique_name)
+            ).fetchone()
+        if row is None or row["checkpoint"] is None:
+            return None
+        return row["stage"], json.loads(row["checkpoint"])
+
+
+run_manifest = RunManifest()
@@ -1,25 +1,29 @@
-from ast import parse
 import json
-from typing import List, Tuple, Union
-from pydantic import BaseModel, create_model, Field
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, create_model, Field
 
-from assets import ROBOTICS_SYSTEM_MESSAGE
-from llm_calls import call_llm_model
-from markdown_io import read_raw_data
-from typing import Optional
-from pydantic import Field
+from assets import ROBOTICS_SYSTEM_MESSAGE, EXTRACT_CONCURRENCY, BATCH_ENRICHMENT
+from llm_calls import call_llm_model_chunked
+from llm_scheduler import scheduler
+from llm_cache import llm_cache
+from markdown_io import read_formatted_data, read_rows, read_raw_data_bulk, save_rows, update_columns, chunked
+from page_index import page_index
+from content_filter import filter_for_extraction
+from company_store import company_store, listing_company, listing_facts, PROFILE_KEYS
+from run_manifest import run_manifest
+from api_management import with_credentials
 
-from api_management import get_supabase_client
 from utils import (
-    generate_pdf_summary,
     enrich_company_metadata,
     correlate_with_abm,
-    extract_launch_date_from_article
+    extract_launch_date_from_article,
+    enrich_listings_batch,
+    LAUNCH_DATE_FIELD
 )
 from abm_docs import get_abm_report_text
 
-# Initialize Supabase client
-supabase = get_supabase_client()
 
 # Dynamic listing model with alias support
 def create_dynamic_listing_model(field_names: List[str]):
@@ -38,31 +42,25 @@ def create_dynamic_listing_model(field_names: List[str]):
         for field in all_fields
     }
 
-    class Config:
-        populate_by_name = True
-        extra = "allow"
+    config = ConfigDict(populate_by_name=True, extra="allow")
 
-    return create_model('DynamicListingModel', __config__=Config, **field_definitions)
+    return create_model('DynamicListingModel', __config__=config, **field_definitions)
 
 # Container model with alias support
 def create_listings_container_model(listing_model: BaseModel):
-    class Config:
-        populate_by_name = True
-        extra = "allow"
+    config = ConfigDict(populate_by_name=True, extra="allow")
 
-    model = create_model(
+    return create_model(
         'DynamicListingsContainer',
-        __config__=Config,
+        __config__=config,
         listings=(List[listing_model], Field(..., alias="listings"))
     )
-    model.model_config = Config
-    return model
 
 
 
 
 
-def save_formatted_data(unique_name: str, formatted_data):
+def formatted_payload(formatted_data) -> dict:
     if isinstance(formatted_data, str):
         try:
             data_json = json.loads(formatted_data)
@@ -72,70 +70,240 @@ def save_formatted_data(unique_name: str, formatted_data):
         data_json = formatted_data.dict()
     else:
         data_json = formatted_data
+    return data_json
 
-    supabase.table("scraped_data").update({
-        "formatted_data": data_json
-    }).eq("unique_name", unique_name).execute()
+def save_formatted_data(unique_name: str, formatted_data):
+    data_json = formatted_payload(formatted_data)
+    update_columns(unique_name, formatted_data=data_json)
 
     print(f"\033[35mINFO: Scraped data saved for {unique_name}\033[0m")
     print(f"[DEBUG] Fields found in parsed data for {unique_name}: {list(data_json.keys())}")
 
-def scrape_urls(unique_names: List[str], fields: List[str], selected_model: str, abm_context: str = ""):
-    total_input_tokens = 0
-    total_output_tokens = 0
-    total_cost = 0
-    parsed_results = []
+def extraction_signature(response_format, selected_model: str) -> str:
+    """Identifies the extraction settings a stored formatted_data was produced with."""
+    schema = response_format.model_json_schema() if response_format else None
+    return hashlib.md5(json.dumps([selected_model, schema], sort_keys=True).encode()).hexdigest()
+
+def load_unchanged_result(uniq: str, signature: str):
+    """Stored formatted_data for a page whose content and extraction settings have not changed, else None."""
+    if not page_index.is_extracted(uniq, signature):
+        return None
+    return read_formatted_data(uniq)
 
+def build_listings_container_model(fields: List[str]):
     DynamicListingModel = create_dynamic_listing_model(fields)
-    DynamicListingsContainer = create_listings_container_model(DynamicListingModel)
-    prompt_to_use = ROBOTICS_SYSTEM_MESSAGE
+    return create_listings_container_model(DynamicListingModel)
 
-    if not abm_context:
-        abm_context = get_abm_report_text()
+def enrich_listings(parsed, markdown: str, selected_model: str, abm_context: str = "",
+                    batch: bool = BATCH_ENRICHMENT, on_stage=None):
+    """
+    Enriches and scores every listing of one article in place.
+    Companies with a fresh entry in the company store (same model and ABM
+    context, no new facts) reuse it; the rest are enriched, once per company,
+    and stored. With `batch`, they share a single structured LLM request.
+    `on_stage` is called with "enriched" once company enrichment is done
+    (for the batched request, which also scores, once that request is done).
+
+    Returns:
+        token_info for the batched request (zeros for the per-listing path)
+    """
+    token_counts = {"input_tokens": 0, "output_tokens": 0}
+    if not (isinstance(parsed, dict) and isinstance(parsed.get("listings"), list)):
+        return token_counts
 
-    for uniq in unique_names:
-        markdown = read_raw_data(uniq)
-        if not markdown:
-            print(f"\033[34mNo raw_data found for {uniq}, skipping.\033[0m")
+    # Reuse stored companies; enrich each remaining company once (first listing
+    # per company) and copy the result onto its duplicates in this article
+    pending, duplicates, facts = [], [], {}
+    keys = {}
+    for listing in parsed["listings"]:
+        entry = company_store.lookup(listing, selected_model, abm_context)
+        if entry:
+            company_store.apply(listing, entry)
             continue
+        key = company_store.resolve(listing_company(listing))
+        if key and key in keys:
+            duplicates.append((listing, keys[key]))
+            continue
+        facts[id(listing)] = listing_facts(listing)
+        if key:
+            keys[key] = listing
+        pending.append(listing)
+
+    if batch:
+        if pending:
+            token_counts = enrich_listings_batch(
+                [(listing, markdown) for listing in pending], abm_context, selected_model
+            )
+        if on_stage:
+            on_stage("enriched")
+    else:
+        for listing in pending:
+            enrich_company_metadata(listing, selected_model)
+        if on_stage:
+            on_stage("enriched")
+        for listing in pending:
+            correlate_with_abm(listing, abm_context, selected_model)
+
+    for listing in pending:
+        if listing.get("Correlation Reason") != "Could not extract explanation.":
+            company_store.remember(listing, selected_model, abm_context, facts[id(listing)])
+    for listing, source in duplicates:
+        company_store.apply(listing, {
+            "profile": {k: source[k] for k in PROFILE_KEYS if k in source},
+            "correlation_reason": source.get("Correlation Reason", ""),
+            "relevancy_score": source.get("Relevancy Score", "1"),
+        })
 
-        response_format = DynamicListingsContainer
+    if not batch:
+        for listing in parsed["listings"]:
+            if not listing.get(LAUNCH_DATE_FIELD) or listing[LAUNCH_DATE_FIELD] == "TBD":
+                result = extract_launch_date_from_article(markdown, selected_model)
+                if (
+                    result.get("project_launch_date") != "TBD"
+                    and result["project_launch_date"] not in markdown
+                ):
+                    result["project_launch_date"] = "TBD"
+                listing.update(result)
+                listing[LAUNCH_DATE_FIELD] = result.get("project_launch_date", "TBD")
+    else:
+        # Reused profiles keep the launch date the extraction found, if the article states it
+        for listing in parsed["listings"]:
+            launch_date = listing.get(LAUNCH_DATE_FIELD) or listing.get("project_launch_date") or "TBD"
+            if launch_date != "TBD" and launch_date not in markdown:
+                launch_date = "TBD"
+            listing[LAUNCH_DATE_FIELD] = listing["project_launch_date"] = launch_date
+    return token_counts
+
+def scrape_markdown(uniq: str, markdown: str, response_format, selected_model: str, abm_context: str = "",
+                    batch_enrichment: bool = BATCH_ENRICHMENT, save: bool = True, run_id: str = None):
+    """
+    Runs extraction and enrichment for one article's markdown and saves the result.
+    Navigation and boilerplate are stripped first (raw_data keeps the original);
+    pages over the model's token budget are extracted chunk by chunk and merged.
+    With save=False the caller is responsible for storing it (e.g. in bulk) and
+    for marking the page as extracted.
+
+    With a run_id, each stage is checkpointed in the run manifest: a restarted
+    run reuses a scored result as is and re-runs only enrichment and scoring
+    on an extracted one.
 
-        parsed, token_counts, cost = call_llm_model(
-            data=markdown,
-            model=selected_model,
-            system_message=prompt_to_use,
-            response_format=response_format,
-            abm_context=abm_context
-        )
+    Returns:
+        (parsed_data, token_info, cost)
+    """
+    no_tokens = {"input_tokens": 0, "output_tokens": 0}
+    resume = run_manifest.checkpoint(run_id, uniq)
+    if resume and resume[0] == "scored":
+        print(f"\033[34mResuming {uniq}: already scored in this run.\033[0m")
+        parsed, token_counts, cost = resume[1], no_tokens, 0
+    else:
+        markdown, _ = filter_for_extraction(uniq, markdown, selected_model)
+        if resume:
+            print(f"\033[34mResuming {uniq}: reusing its extraction, re-running enrichment.\033[0m")
+            parsed, token_counts, cost = resume[1], no_tokens, 0
+        else:
+            parsed, token_counts, cost = call_llm_model_chunked(
+                data=markdown,
+                model=selected_model,
+                system_message=ROBOTICS_SYSTEM_MESSAGE,
+                response_format=response_format,
+                abm_context=abm_context
+            )
+            if hasattr(parsed, "model_dump"):
+                parsed = parsed.model_dump()
+            run_manifest.advance(run_id, uniq, "extracted", parsed)
         print(f"[DEBUG] Returned top-level fields: {list(parsed.keys()) if isinstance(parsed, dict) else type(parsed)}")
         if isinstance(parsed, dict) and "listings" in parsed:
             for i, listing in enumerate(parsed["listings"]):
                 print(f"[DEBUG] Listing {i} fields: {list(listing.keys())}")
 
-        if isinstance(parsed, dict) and "listings" in parsed:
-            for listing in parsed["listings"]:
-                enrich_company_metadata(listing)
-                correlate_with_abm(listing, abm_context)
-                if not listing.get("Project launch date") or listing["Project launch date"] == "TBD":
-                    result = extract_launch_date_from_article(markdown, selected_model)
-                    if (
-                        result.get("project_launch_date") != "TBD"
-                        and result["project_launch_date"] not in markdown
-                    ):
-                        result["project_launch_date"] = "TBD"
-                    listing.update(result)
-
+        enrich_tokens = enrich_listings(parsed, markdown, selected_model, abm_context, batch=batch_enrichment,
+                                        on_stage=lambda stage: run_manifest.advance(run_id, uniq, stage))
+        token_counts = {
+            "input_tokens": token_counts["input_tokens"] + enrich_tokens["input_tokens"],
+            "output_tokens": token_counts["output_tokens"] + enrich_tokens["output_tokens"]
+        }
+        run_manifest.advance(run_id, uniq, "scored", parsed)
+    if save:
         save_formatted_data(uniq, parsed)
+        page_index.mark_extracted(uniq, extraction_signature(response_format, selected_model))
+    return parsed, token_counts, cost
+
+def scrape_urls(unique_names: List[str], fields: List[str], selected_model: str, abm_context: str = "",
+                max_workers: int = EXTRACT_CONCURRENCY, batch_enrichment: bool = BATCH_ENRICHMENT,
+                run_id: str = None):
+    """
+    Extracts and enriches every article in `unique_names`, `max_workers` at a time.
+    All LLM calls go through the shared rate-limit scheduler, so raising
+    max_workers fills the model's quota without tripping its limits.
+    Results keep the order of `unique_names`. With a run_id, articles resume
+    from their run manifest checkpoints (see scrape_markdown).
+    """
+    total_input_tokens = 0
+    total_output_tokens = 0
+    total_cost = 0
+    parsed_results = []
 
-        total_input_tokens += token_counts["input_tokens"]
-        total_output_tokens += token_counts["output_tokens"]
-        total_cost += cost
+    response_format = build_listings_container_model(fields)
 
-        parsed_results.append({
-            "unique_name": uniq,
-            "parsed_data": parsed
-        })
+    if not abm_context:
+        abm_context = get_abm_report_text()
 
-    return total_input_tokens, total_output_tokens, total_cost, parsed_results
+    signature = extraction_signature(response_format, selected_model)
 
+    # Work through the names one storage batch at a time: one bulk read of the
+    # stored results / raw markdown and one bulk upsert of the new results per batch
+    for names in chunked(unique_names):
+        unchanged = [uniq for uniq in names if page_index.is_extracted(uniq, signature)]
+        reused = {uniq: row["formatted_data"] for uniq, row in read_rows(unchanged, ["formatted_data"]).items()
+                  if row.get("formatted_data")} if unchanged else {}
+        raw_by_name = read_raw_data_bulk([uniq for uniq in names if uniq not in reused])
+
+        def scrape_one(uniq: str):
+            if uniq in reused:
+                print(f"\033[34mPage unchanged for {uniq}, reusing stored formatted_data.\033[0m")
+                return reused[uniq], {"input_tokens": 0, "output_tokens": 0}, 0
+
+            markdown = raw_by_name.get(uniq, "")
+            if not markdown:
+                print(f"\033[34mNo raw_data found for {uniq}, skipping.\033[0m")
+                return None
+            # One failing article must not abort the batch: its finished siblings still get saved
+            try:
+                return scrape_markdown(uniq, markdown, response_format, selected_model, abm_context,
+                                       batch_enrichment, save=False, run_id=run_id)
+            except Exception as e:
+                print(f"[scraper] Extraction failed for {uniq}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            outcomes = list(executor.map(with_credentials(scrape_one), names))
+
+        new_rows = []
+        for uniq, outcome in zip(names, outcomes):
+            if outcome is None:
+                continue
+            parsed, token_counts, cost = outcome
+            if uniq in reused:
+                run_manifest.advance(run_id, uniq, "scored")
+            else:
+                new_rows.append({"unique_name": uniq, "formatted_data": formatted_payload(parsed)})
+
+            total_input_tokens += token_counts["input_tokens"]
+            total_output_tokens += token_counts["output_tokens"]
+            total_cost += cost
+
+            parsed_results.append({
+                "unique_name": uniq,
+                "parsed_data": parsed
+            })
+
+        if new_rows:
+            save_rows(new_rows)
+            for row in new_rows:
+                page_index.mark_extracted(row["unique_name"], signature)
+            print(f"\033[35mINFO: Scraped data saved for {len(new_rows)} articles\033[0m")
+
+    print(f"[scraper] LLM scheduler stats: {scheduler.stats()}")
+    print(f"[scraper] LLM cache stats: {llm_cache.stats()}")
+    print(f"[scraper] Company store stats: {company_store.stats()}")
+    return total_input_tokens, total_output_tokens, total_cost, parsed_results
@@ -0,0 +1,247 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+from api_management import get_supabase_client
+from assets import STORAGE_BACKEND, LOCAL_DB_PATH, SUPABASE_BATCH_SIZE
+
+TABLE = "scraped_data"
+CHUNK_TABLE = "raw_chunks"
+COLUMNS = ["unique_name", "url", "raw_data", "formatted_data", "pagination_data"]
+BLOB_COLUMNS = {"raw_data", "formatted_data", "pagination_data"}
+
+
+class StorageBackend(ABC):
+    """
+    Row store for the scraped_data table. Rows are dicts keyed by column name;
+    raw_data, formatted_data and pagination_data hold JSON-compatible values.
+    """
+
+    @abstractmethod
+    def read_rows(self, unique_names: List[str], columns: List[str]) -> Dict[str, dict]:
+        """Selected columns for many rows, keyed by unique_name. Missing names are absent."""
+
+    @abstractmethod
+    def upsert_rows(self, rows: List[dict]):
+        """Insert or update by unique_name, writing only the columns present in each row."""
+
+    @abstractmethod
+    def update_columns(self, unique_name: str, columns: dict):
+        """Update the given columns of an existing row."""
+
+    def write_chunks(self, unique_name: str, chunks: List[dict]):
+        """Replace the raw page chunks ({"idx", "url", "codec", "data": bytes}) of one row."""
+        self.write_chunks_many([(unique_name, chunks)])
+
+    @abstractmethod
+    def write_chunks_many(self, items: List[Tuple[str, List[dict]]]):
+        """Replace the raw page chunks of many rows at once: (unique_name, chunks) pairs."""
+
+    @abstractmethod
+    def read_chunks(self, unique_names: List[str], indices: List[int] = None) -> Dict[str, List[dict]]:
+        """Raw page chunks per unique_name, ordered by idx; only `indices` if given."""
+
+
+class SupabaseStorage(StorageBackend):
+    def __init__(self, client, batch_size: int = SUPABASE_BATCH_SIZE):
+        self.client = client
+        self.batch_size = batch_size
+
+    def read_rows(self, unique_names, columns):
+        rows = {}
+        select = ",".join(["unique_name"] + [c for c in columns if c != "unique_name"])
+        names = list(dict.fromkeys(unique_names))
+        for i in range(0, len(names), self.batch_size):
+            batch = names[i:i + self.batch_size]
+            response = self.client.table(TABLE).select(select).in_("unique_name", batch).execute()
+            for row in response.data or []:
+                rows.setdefault(row["unique_name"], row)
+        return rows
+
+    def upsert_rows(self, rows):
+        for i in range(0, len(rows), self.batch_size):
+            self.client.table(TABLE).upsert(rows[i:i + self.batch_size], on_conflict="unique_name").execute()
+
+    def update_columns(self, unique_name, columns):
+        self.client.table(TABLE).update(columns).eq("unique_name", unique_name).execute()
+
+    def write_chunks_many(self, items):
+        rows = [{
+            "unique_name": unique_name,
+            "idx": chunk["idx"],
+            "url": chunk["url"],
+            "codec": chunk["codec"],
+            "data": base64.b64encode(chunk["data"]).decode("ascii"),
+        } for unique_name, chunks in items for chunk in chunks]
+        for i in range(0, len(rows), self.batch_size):
+            self.client.table(CHUNK_TABLE).upsert(rows[i:i + self.batch_size], on_conflict="unique_name,idx").execute()
+        # Drop chunks left over from a longer previous version: one delete per distinct page count
+        names_by_count = {}
+        for unique_name, chunks in items:
+            names_by_count.setdefault(len(chunks), []).append(unique_name)
+        for count, names in names_by_count.items():
+            for i in range(0, len(names), self.batch_size):
+                self.client.table(CHUNK_TABLE).delete().in_("unique_name", names[i:i + self.batch_size]) \
+                    .gte("idx", count).execute()
+
+    def read_chunks(self, unique_names, indices=None):
+        if indices is not None and not indices:
+            return {}
+        chunks = {}
+        names = list(dict.fromkeys(unique_names))
+        for i in range(0, len(names), self.batch_size):
+            query = self.client.table(CHUNK_TABLE).select("unique_name,idx,url,codec,data") \
+                .in_("unique_name", names[i:i + self.batch_size])
+            if indices is not None:
+                query = query.in_("idx", list(indices))
+            for row in query.order("idx").execute().data or []:
+                row["data"] = base64.b64decode(row["data"])
+                chunks.setdefault(row["unique_name"], []).append(row)
+        return chunks
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Local, embedded stand-in for the Supabase table: same columns, a unique
+    index on unique_name, and the JSON columns stored as zlib-compressed blobs.
+    Lets single-node batch runs skip the network and the pipeline run offline.
+    """
+
+    def __init__(self, path: str = LOCAL_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABLE} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                unique_name TEXT NOT NULL,
+                url TEXT,
+                raw_data BLOB,
+                formatted_data BLOB,
+                pagination_data BLOB,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{TABLE}_unique_name ON {TABLE} (unique_name)")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CHUNK_TABLE} (
+                unique_name TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                url TEXT,
+                codec TEXT,
+                data BLOB,
+                PRIMARY KEY (unique_name, idx)
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def encode(column: str, value):
+        if column not in BLOB_COLUMNS or value is None:
+            return value
+        return zlib.compress(json.dumps(value).encode("utf-8"))
+
+    @staticmethod
+    def decode(column: str, value):
+        if column not in BLOB_COLUMNS or value is None:
+            return value
+        return json.loads(zlib.decompress(value).decode("utf-8"))
+
+    def read_rows(self, unique_names, columns):
+        columns = ["unique_name"] + [c for c in columns if c != "unique_name"]
+        names = list(dict.fromkeys(unique_names))
+        rows = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(names), 500):
+                batch = names[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._conn.execute(
+                    f"SELECT {', '.join(columns)} FROM {TABLE} WHERE unique_name IN ({placeholders})", batch
+                )
+                for values in cursor:
+                    rows[values[0]] = {c: self.decode(c, v) for c, v in zip(columns, values)}
+        return rows
+
+    def upsert_rows(self, rows):
+        with self._lock:
+            for row in rows:
+                columns = [c for c in COLUMNS if c in row]
+                updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "unique_name")
+                conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+                self._conn.execute(
+                    f"INSERT INTO {TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                    f"ON CONFLICT(unique_name) {conflict}",
+                    [self.encode(c, row[c]) for c in columns]
+                )
+            self._conn.commit()
+
+    def update_columns(self, unique_name, columns):
+        columns = {c: v for c, v in columns.items() if c in COLUMNS and c != "unique_name"}
+        if not columns:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE {TABLE} SET {', '.join(f'{c} = ?' for c in columns)} WHERE unique_name = ?",
+                [self.encode(c, v) for c, v in columns.items()] + [unique_name]
+            )
+            self._conn.commit()
+
+    def write_chunks_many(self, items):
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM {CHUNK_TABLE} WHERE unique_name = ?",
+                                   [(unique_name,) for unique_name, _ in items])
+            self._conn.executemany(
+                f"INSERT INTO {CHUNK_TABLE} (unique_name, idx, url, codec, data) VALUES (?, ?, ?, ?, ?)",
+                [(unique_name, c["idx"], c["url"], c["codec"], c["data"]) for unique_name, chunks in items for c in chunks]
+            )
+            self._conn.commit()
+
+    def read_chunks(self, unique_names, indices=None):
+        if indices is not None and not indices:
+            return {}
+        chunks = {}
+        names = list(dict.fromkeys(unique_names))
+        with self._lock:
+            for i in range(0, len(names), 500):
+                batch = names[i:i + 500]
+                sql = f"SELECT unique_name, idx, url, codec, data FROM {CHUNK_TABLE} " \
+                      f"WHERE unique_name IN ({','.join('?' * len(batch))})"
+                params = list(batch)
+                if indices is not None:
+                    sql += f" AND idx IN ({','.join('?' * len(indices))})"
+                    params += list(indices)
+                for name, idx, url, codec, data in self._conn.execute(sql + " ORDER BY unique_name, idx", params):
+                    chunks.setdefault(name, []).append(
+                        {"unique_name": name, "idx": idx, "url": url, "codec": codec, "data": data}
+                    )
+        return chunks
+
+
+_storage = None
+
+
+def get_storage():
+    """
+    Returns the configured storage backend ("supabase" or "sqlite", from the
+    SCRAPER_STORAGE env var), or None when Supabase is selected but not configured.
+    """
+    global _storage
+    if _storage is None:
+        backend = os.getenv("SCRAPER_STORAGE", STORAGE_BACKEND).lower()
+        if backend == "sqlite":
+            _storage = SQLiteStorage(os.getenv("SCRAPER_DB_PATH", LOCAL_DB_PATH))
+        else:
+            client = get_supabase_client()
+            if client is None:
+                return None
+            _storage = SupabaseStorage(client)
+    return _storage
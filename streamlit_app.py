@@ -16,41 +16,46 @@ import streamlit as st
 nest_asyncio.apply()
 
 from streamlit_tags import st_tags_sidebar
-import pandas as pd
-import json
 import re
 import sys
+import time
+import uuid
 import asyncio
-import numpy as np
-from markdown_io import get_paginated_urls
+from markdown_io import get_paginated_urls_many
 
 
 
 # ---local imports---
-from scraper import scrape_urls
-from markdown import fetch_and_store_markdowns
-from assets import MODELS_USED
-from api_management import get_supabase_client
-from abm_docs import extract_text_from_pdf, get_abm_report_text
-from utils import generate_pdf_summary
+from assets import MODELS_USED, DEFAULT_FIELDS, JOB_POLL_SECONDS
+from api_management import session_credentials
+from jobs import job_manager, FINISHED, FAILED, CANCELLED
+from storage import get_storage
+from abm_docs import load_abm_text, load_abm_summary
+from results_frame import build_results_frame, filter_by_relevancy
+from exporter import build_export, export_plan
 
 # Windows compatibility
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 st.set_page_config(page_title="Robotics Articles Scraper")
-supabase = get_supabase_client()
-if supabase is None:
-    st.error("🚨 Supabase is not configured!")
+storage = get_storage()
+if storage is None:
+    st.error("🚨 Supabase is not configured! (or set SCRAPER_STORAGE=sqlite to use local storage)")
     st.stop()
 
 st.title("🤖 Robotics Articles Scraper")
 
-# Session state setup
-if 'scraping_state' not in st.session_state:
-    st.session_state['scraping_state'] = 'idle'
-if 'results' not in st.session_state:
-    st.session_state['results'] = None
+# Identifies this browser session to the job manager, which only shows a session its own jobs
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+session_id = st.session_state["session_id"]
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cached_results_frame(results_key: str, _all_data):
+    """Results frame for a job's results so far; keyed by job id + result count, so reruns and slider moves skip the rebuild."""
+    return build_results_frame(_all_data)
 
 st.sidebar.title("ABM Strategy Settings")
 
@@ -72,26 +77,14 @@ abm_file = st.sidebar.file_uploader("Upload ABM PDF", type=["pdf"])
 abm_context = ""
 abm_summary = ""
 if abm_file:
-    import fitz
-    from litellm.exceptions import RateLimitError
-
-    doc = fitz.open(stream=abm_file.read(), filetype="pdf")
-    abm_context = "\n\n".join([page.get_text() for page in doc])
+    # Parsed text and summaries are cached by file content, so reruns skip fitz and the LLM
+    abm_bytes = abm_file.getvalue()
+    abm_context = load_abm_text(abm_bytes, abm_file.name)
 
     if generate_summary:
-        try:
-            abm_summary = generate_pdf_summary(abm_context, "gpt-4o")
-        except RateLimitError:
-            st.warning("Rate limit hit for gpt-4o — falling back to gpt-4o-mini.")
-            abm_summary = generate_pdf_summary(abm_context, "gpt-4o-mini")
-
-DEFAULT_FIELDS = [
-    "Article Name", "Article Summary", "Article Date", "Article URL",
-    "Company", "Company Info", "Region", "Company Size", "Raised Funding",
-    "Recent Developments", "Partnerships", "Media Mentions", "Focus",
-    "Humanoid Robotics Use Case", "Single Use Cases", "Task Streamlining",
-    "Project launch date", "Relevancy Score", "Correlation Reason"
-]
+        # Rate limits are retried by the LLM scheduler; a summary that still fails reads "Summary unavailable."
+        abm_summary = load_abm_summary(abm_bytes, "gpt-4o", abm_context)
+
 
 show_tags = st.sidebar.toggle("Enable Scraping")
 fields = DEFAULT_FIELDS.copy()
@@ -121,13 +114,11 @@ with st.sidebar.container():
     with col2:
         if st.button("Add URLs"):
             if url_text.strip():
-                new_urls = []
                 input_urls = re.split(r"\s+", url_text.strip())
-                for url in input_urls:
-                    if enable_pagination:
-                        new_urls += get_paginated_urls(url, int(num_pages))
-                    else:
-                        new_urls.append(url)
+                if enable_pagination:
+                    new_urls = get_paginated_urls_many(input_urls, int(num_pages))
+                else:
+                    new_urls = list(input_urls)
 
                 if "urls_splitted" not in st.session_state:
                     st.session_state["urls_splitted"] = []
@@ -152,164 +143,130 @@ with st.sidebar.container():
 st.sidebar.markdown("---")
 
 
+def error_message(error_str: str, model: str) -> str:
+    # Check for specific error types with broader patterns
+    if any(term in error_str for term in ["API key not valid", "authentication", "auth error"]):
+        return f"Please enter a valid API key for the selected model: {model}"
+    if any(term in error_str for term in ["LLM Provider NOT provided", "provider not", "You passed model=GNEWS"]):
+        return f"Invalid model configuration. Please check the model settings for '{model}'"
+    return f"An error occurred: {error_str}"
+
 if st.sidebar.button("START SCRAPING", type="primary"):
     if not st.session_state["urls_splitted"]:
         st.error("Please enter at least one URL.")
     elif show_tags and len(fields) == 0:
         st.error("Please enter at least one field to extract.")
     else:
-        all_urls = st.session_state["urls_splitted"]
-        unique_names = fetch_and_store_markdowns(all_urls)
-        st.session_state.update({
-            'urls': all_urls,
-            'fields': fields,
-            'model_selection': model_selection,
-            'unique_names': unique_names,
-            'scraping_state': 'scraping'
-        })
-
-if st.session_state['scraping_state'] == 'scraping':
-    try:
-        with st.spinner("Processing..."):
-            unique_names = st.session_state["unique_names"]
-            total_input_tokens = 0
-            total_output_tokens = 0
-            total_cost = 0
-            all_data = []
-            error_str = ""
-
-            try:
-                in_tokens_s, out_tokens_s, cost_s, parsed_data = scrape_urls(
-                    unique_names, st.session_state['fields'], st.session_state['model_selection'], abm_context)
-                total_input_tokens += in_tokens_s
-                total_output_tokens += out_tokens_s
-                total_cost += cost_s
-                all_data = parsed_data
-            except Exception as api_error:
-                # Check for specific error types with broader patterns
-                if any(term in error_str for term in ["API key not valid", "authentication", "auth error"]):
-                    st.error(f"Please enter a valid API key for the selected model: {st.session_state['model_selection']}")
-                elif any(term in error_str for term in ["LLM Provider NOT provided", "provider not", "You passed model=GNEWS"]):
-                    st.error(f"Invalid model configuration. Please check the model settings for '{st.session_state['model_selection']}'")
-                else:
-                    st.error(f"An error occurred: {api_error}")
-                    # raise ValueError("An error occurred while scraping the URLs. Please check the logs for more details.")
-
-            st.session_state.update({
-                'in_tokens_s': in_tokens_s,
-                'out_tokens_s': out_tokens_s,
-                'cost_s': cost_s
-            })
-
-            st.session_state['results'] = {
-                'data': all_data,
-                'input_tokens': total_input_tokens,
-                'output_tokens': total_output_tokens,
-                'total_cost': total_cost,
-                'abm_summary': abm_summary
-            }
-            st.session_state['scraping_state'] = 'completed'
-
-    except Exception as e:
-        st.error(f"An error occurred during scraping: {e}")
-        st.session_state['scraping_state'] = 'idle'
-
-if st.session_state['scraping_state'] == 'completed' and st.session_state['results']:
-    results = st.session_state['results']
+        # The job runs in the background; its worker threads get the sidebar's keys from here
+        job = job_manager.submit(st.session_state["urls_splitted"], fields, model_selection, abm_context, abm_summary,
+                                 credentials=session_credentials(), owner=session_id)
+        st.session_state['selected_job'] = job.id
+        st.toast(f"Scraping job {job.id} started")
+
+
+def render_results(results: dict):
     all_data = results['data']
-    abm_summary = results.get('abm_summary', '')
+    finished = results['status'] in FINISHED
 
-    st.subheader("Scraping Results")
-    if abm_summary:
+    if results.get('abm_summary'):
         st.markdown("### ABM PDF Summary")
-        st.text(abm_summary)
-
-    all_rows = []
-    for i, data_item in enumerate(all_data, start=1):
-        if not isinstance(data_item, dict):
-            continue
-
-        parsed_obj = data_item.get("parsed_data", {})
-        if hasattr(parsed_obj, "model_dump"):
-            parsed_obj = parsed_obj.model_dump()
-        elif isinstance(parsed_obj, str):
-            try:
-                parsed_obj = json.loads(parsed_obj)
-            except json.JSONDecodeError:
-                parsed_obj = {}
-
-        if isinstance(parsed_obj, dict) and "listings" in parsed_obj and isinstance(parsed_obj["listings"], list):
-            article_summary = parsed_obj.get("article_summary", "")
-            for listing in parsed_obj["listings"]:
-                listing["article_summary"] = article_summary
-                all_rows.append(listing)
-        else:
-            all_rows.append(parsed_obj)
-            
+        st.text(results['abm_summary'])
+
+    # Built once per job and result count, and cached; the slider below only re-applies a vectorized mask
+    results_df = cached_results_frame(f"{results['id']}:{len(all_data)}", all_data)
+
     display_df = None
-    if not all_rows:
-        st.warning("No data rows to display.")
+    if results_df.empty:
+        st.warning("No data rows to display yet." if not finished else "No data rows to display.")
     else:
-        # Create DataFrame from parsed listings
-        df = pd.DataFrame(all_rows)
-
-        # Standardize column names
-        df.columns = [str(col).strip().replace("_", " ").title() for col in df.columns]
-
-        # Remove empty strings and duplicates
-        df.replace("", np.nan, inplace=True)
-        df = df.loc[:, ~df.columns.duplicated()]  # Fix: drop duplicate columns
-        
-        if "Relevancy Score" in df.columns:
-            try:
-                df["Relevancy Score"] = pd.to_numeric(df["Relevancy Score"], errors="coerce")
-                min_score = st.slider("🎯 Filter by minimum Relevancy Score", min_value=1, max_value=5, value=3)
-                df = df[df["Relevancy Score"] >= min_score]
-            except Exception:
-                st.warning("⚠️ Could not convert Relevancy Score to a numeric format.")
-
-    # Display priority columns first
-        priority_cols = [
-            "Article Name", "Article Summary", "Article Date", "Article URL",
-            "Company", "Company Info", "Focus", "Region",
-            "Humanoid Robotics Use Case", "Single Use Cases", "Task Streamlining",
-            "Raised Funding", "Recent Developments", "Partnerships",
-            "Relevancy Score", "Correlation Reason"
-        ]
-        display_cols = [col for col in priority_cols if col in df.columns]
-        other_cols = [col for col in df.columns if col not in display_cols]
-        display_df = df[display_cols + other_cols]
-
-       
+        display_df = results_df
+        if "Relevancy Score" in results_df.columns:
+            min_score = st.slider("🎯 Filter by minimum Relevancy Score", min_value=1, max_value=5, value=3)
+            display_df = filter_by_relevancy(results_df, min_score)
 
         st.subheader("📊 Extracted Company Insights")
         st.dataframe(display_df, use_container_width=True)
 
     st.subheader("Download Extracted Data")
+    if not finished:
+        st.caption("Downloads are available once the job has finished.")
+        return
 
-    col1, col2 = st.columns(2)
-    with col1:
-        json_data = json.dumps(
-            all_data,
-            default=lambda o: o.dict() if hasattr(o, 'dict') else str(o),
-            indent=4
-        )
-        st.download_button("Download JSON", data=json_data, file_name="scraped_data.json")
-
-    with col2:  # ✅ moved out from under col1
-        if display_df is not None and not display_df.empty:
-            csv_data = display_df.to_csv(index=False)
-            st.download_button("Download CSV", data=csv_data, file_name="scraped_data.csv")
-        else:
-            st.warning("No structured data available to download as CSV.")
-
-
-   
-    
+    # Exports are only built when a button is clicked, written in chunks to a temp file
+    export_path = results.get('export_path')
+    jsonl_source = export_path if export_path and os.path.exists(export_path) else all_data
+    jsonl_size = os.path.getsize(export_path) if isinstance(jsonl_source, str) else 0
 
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        name, mime, compress = export_plan("jsonl", size=jsonl_size)
+        st.download_button("Download JSONL", data=lambda compress=compress: build_export("jsonl", jsonl_source, compress),
+                           file_name=name, mime=mime, on_click="ignore")
+
+    if display_df is not None and not display_df.empty:
+        for col, fmt in ((col2, "csv"), (col3, "parquet"), (col4, "xlsx")):
+            with col:
+                name, mime, compress = export_plan(fmt, rows=len(display_df))
+                st.download_button(f"Download {fmt.upper()}",
+                                   data=lambda fmt=fmt, compress=compress: build_export(fmt, display_df, compress),
+                                   file_name=name, mime=mime, on_click="ignore")
+    else:
+        st.warning("No structured data available to download as CSV, Parquet or XLSX.")
+
+
+def job_label(job_id: str) -> str:
+    job = job_manager.get(job_id, session_id)
+    if job is None:
+        return job_id
+    # Kept stable while the job runs (a changing label would reset the selection); progress is shown below
+    return f"{job.id} · {len(job.urls)} URLs · {job.model} · {time.strftime('%H:%M', time.localtime(job.submitted_at))}"
+
+# Jobs live in the server process, so they keep running across reruns; each session only sees its own
+jobs = job_manager.list(session_id)
+if st.session_state.get('selected_job') not in [job.id for job in jobs]:
+    st.session_state.pop('selected_job', None)
+
+if jobs:
+    st.subheader("Scraping Jobs")
+    selected_job = st.selectbox("Job", [job.id for job in jobs], format_func=job_label, key='selected_job')
+    any_running = any(not job.finished for job in jobs)
+
+    # Only this part re-runs while jobs are in flight, every JOB_POLL_SECONDS
+    @st.fragment(run_every=JOB_POLL_SECONDS if any_running else None)
+    def show_job(job_id: str):
+        job = job_manager.get(job_id, session_id)
+        if job is None:
+            st.warning("This job is no longer available.")
+            return
+        results = job.snapshot()
+        processed, total = len(results['data']), results['total']
+
+        if results['status'] in FINISHED:
+            st.subheader("Scraping Results")
+        if results['status'] == FAILED:
+            st.error(error_message(results['error'], results['model']))
+        elif results['status'] == CANCELLED:
+            st.warning(f"Job cancelled after {processed} of {total} articles. Start it again to resume it.")
+        elif not job.finished:
+            st.progress(min(processed / max(total, 1), 1.0),
+                        text=f"{processed} / {total} articles processed ({results['status']})")
+            st.markdown("\n".join(f"- ✅ {r['unique_name']}" for r in results['data'][-10:]))
+            if st.button("Cancel job", key=f"cancel_{job_id}"):
+                job_manager.cancel(job_id, session_id)
+        if results['resumed']:
+            st.info("Resumed an interrupted run: "
+                    + ", ".join(f"{count} URLs already {stage}" for stage, count in results['resumed'].items()))
+        st.caption(f"Tokens in/out: {results['input_tokens']}/{results['output_tokens']} · "
+                   f"cost: ${results['total_cost']:.4f} · {results['elapsed']:.0f}s")
+
+        render_results(results)
+
+        if st.button("Remove job", key=f"remove_{job_id}"):
+            job_manager.remove(job_id, session_id)
+            st.rerun()
 
-    # Clear results
-    if st.sidebar.button("Clear Results"):
-        st.session_state['scraping_state'] = 'idle'
-        st.session_state['results'] = None
+        # Once every job has finished, one full rerun refreshes the job list and stops the polling
+        if any_running and all(job.finished for job in job_manager.list(session_id)):
+            st.rerun()
 
+    show_job(selected_job)
@@ -1,13 +1,18 @@
-import os
+import re
 import json
 import uuid
-import requests
-from datetime import datetime, timedelta
-from litellm import completion
-from assets import MODELS_USED
-from api_management import get_api_key
-from news_utils import get_media_mentions  
-from api_management import get_api_key
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from llm_scheduler import scheduled_completion
+from assets import (
+    PDF_SUMMARY_SECTION_TOKENS, PDF_SUMMARY_PAGES_PER_SECTION,
+    PDF_SUMMARY_CONCURRENCY, PDF_SUMMARY_REDUCE_FANIN
+)
+from abm_store import abm_store
+from chunking import chunk_budget, count_tokens, split_markdown
+from api_management import get_api_key, with_credentials
+from news_utils import get_media_mentions, get_media_mentions_many
+from abm_retrieval import relevant_abm_context
 
 def generate_unique_name(prefix="doc"):
     """
@@ -16,21 +21,31 @@ def generate_unique_name(prefix="doc"):
     return f"{prefix}_{uuid.uuid4().hex[:8]}"
 
 
-def generate_pdf_summary(pdf_text: str, model: str):
+def content_unique_name(prefix: str, content: str) -> str:
     """
-    Generate a detailed summary of the ABM PDF content.
-    The summary should include key points, highlights, and any significant sections in the document.
+    Stable name for a document: the prefix plus a hash of its content, so the
+    same page content maps to the same name across runs and restarts.
     """
-    # Retrieve the appropriate environment variable for API access
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
+    return f"{prefix}_{hashlib.sha256((content or '').encode('utf-8')).hexdigest()[:12]}"
+
+
+COMPANY_SUFFIXES = {"inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited",
+                    "llc", "plc", "gmbh", "ag", "sa", "bv", "oy", "ab", "group", "holdings"}
+
+def normalize_company_name(name) -> str:
+    """
+    Lowercased company name without punctuation or legal suffixes, so
+    "Figure AI, Inc." and "figure ai" compare equal.
+    """
+    words = re.sub(r"[^\w\s]", " ", str(name or "").lower()).split()
+    while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
 
-    # Detailed prompt for generating a detailed summary from the PDF content
-    prompt = f"""
-    You are an assistant that generates detailed summaries of stakeholder documents. Please read the following ABM PDF content and provide a detailed summary.
 
+PDF_SUMMARY_PROMPT = """
+    You are an assistant that generates detailed summaries of stakeholder documents. Please read the following ABM PDF content and provide a detailed summary.
+    {note}
     The summary should include:
     - Key highlights
     - Important sections such as strategic updates, financial performance, or innovation updates
@@ -51,23 +66,157 @@ def generate_pdf_summary(pdf_text: str, model: str):
     Only return a clear and concise summary, without additional commentary, formatting, or unnecessary details. Focus on delivering a comprehensive overview that captures all relevant information.
     """
 
-    # Call to the language model to generate the summary
-    response = completion(
+SECTION_SUMMARY_PROMPT = """
+Summarize this section of an ABM Industries stakeholder report. Keep every concrete fact: figures and
+key metrics, strategic goals, innovation updates, business-area developments, partnerships, and future
+priorities. Summarize tables and charts by their key numbers. Return plain text only.
+
+---
+{section}
+"""
+
+COMBINE_SUMMARY_PROMPT = """
+Merge these partial summaries of consecutive sections of an ABM Industries stakeholder report into one
+summary. Keep every concrete figure, goal, partnership and priority; drop repetition. Return plain text only.
+
+---
+{summaries}
+"""
+
+PDF_SUMMARY_SYSTEM = "You summarize stakeholder PDFs in detail, including financial performance, strategic goals, and other significant details."
+
+
+def summary_completion(model: str, prompt: str) -> str:
+    response = scheduled_completion(
         model=model,
         messages=[
-            {"role": "system", "content": "You summarize stakeholder PDFs in detail, including financial performance, strategic goals, and other significant details."},
+            {"role": "system", "content": PDF_SUMMARY_SYSTEM},
             {"role": "user", "content": prompt}
         ]
     )
+    return response.choices[0].message.content.strip()
+
 
+def split_pdf_sections(pdf_text: str, model: str):
+    """
+    Page-range sections of the extracted PDF text (pages are separated by form
+    feeds), each further split to fit the summary token budget. Text without
+    page breaks is split on the token budget alone.
+    """
+    budget = min(chunk_budget(model), PDF_SUMMARY_SECTION_TOKENS)
+    if count_tokens(pdf_text, model) <= budget:
+        return [pdf_text]
+    pages = pdf_text.split("\f")
+    ranges = ["\n".join(pages[i:i + PDF_SUMMARY_PAGES_PER_SECTION])
+              for i in range(0, len(pages), PDF_SUMMARY_PAGES_PER_SECTION)]
+    return [part for section in ranges for part in split_markdown(section, model, budget) if part.strip()]
+
+
+def summarize_section(section: str, model: str) -> str:
+    """Summary of one page range, cached by the hash of its text so unchanged sections are never re-summarized."""
+    digest = hashlib.sha256(section.encode("utf-8")).hexdigest()
+    cached = abm_store.get_section_summary(digest, model)
+    if cached is not None:
+        return cached
     try:
-        # Extract and return the summary from the model's response
-        return response.choices[0].message.content.strip()
+        summary = summary_completion(model, SECTION_SUMMARY_PROMPT.format(section=section))
+    except Exception as e:
+        print("[generate_pdf_summary] Section summary failed:", e)
+        return ""
+    if summary:
+        abm_store.set_section_summary(digest, model, summary)
+    return summary
+
+
+def reduce_summaries(summaries, model: str):
+    """Combines partial summaries in groups of PDF_SUMMARY_REDUCE_FANIN until they fit one request."""
+    budget = min(chunk_budget(model), PDF_SUMMARY_SECTION_TOKENS)
+    while len(summaries) > 1 and count_tokens("\n\n".join(summaries), model) > budget:
+        groups = [summaries[i:i + PDF_SUMMARY_REDUCE_FANIN]
+                  for i in range(0, len(summaries), PDF_SUMMARY_REDUCE_FANIN)]
+        with ThreadPoolExecutor(max_workers=PDF_SUMMARY_CONCURRENCY) as executor:
+            summaries = list(executor.map(
+                with_credentials(lambda group: summary_completion(model, COMBINE_SUMMARY_PROMPT.format(summaries="\n\n".join(group)))),
+                groups
+            ))
+    return summaries
+
+
+def generate_pdf_summary(pdf_text: str, model: str):
+    """
+    Generate a detailed summary of the ABM PDF content.
+    The summary should include key points, highlights, and any significant sections in the document.
+
+    Reports that do not fit one request are summarized map-reduce style: page-range
+    sections are summarized concurrently (each cached by its content hash), the
+    section summaries are combined hierarchically until they fit, and the final
+    summary is written from them.
+    """
+    try:
+        sections = split_pdf_sections(pdf_text, model)
+        if len(sections) <= 1:
+            return summary_completion(model, PDF_SUMMARY_PROMPT.format(note="", pdf_text=pdf_text))
+
+        print(f"[generate_pdf_summary] Summarizing {len(sections)} sections with {model}")
+        with ThreadPoolExecutor(max_workers=PDF_SUMMARY_CONCURRENCY) as executor:
+            section_summaries = [s for s in executor.map(with_credentials(lambda section: summarize_section(section, model)), sections) if s]
+        if not section_summaries:
+            return "Summary unavailable."
+
+        combined = reduce_summaries(section_summaries, model)
+        note = "The content below is a set of section-by-section summaries of one long report, in order.\n"
+        return summary_completion(model, PDF_SUMMARY_PROMPT.format(note=note, pdf_text="\n\n".join(combined)))
     except Exception as e:
         print("[generate_pdf_summary] Error:", e)
         return "Summary unavailable."
 
 
+# Listing field for the launch date, as named in DEFAULT_FIELDS / the response_format
+# (shown as "Project Launch Date" in the results frame)
+LAUNCH_DATE_FIELD = "Project launch date"
+
+# Enriched profile keys -> Pydantic alias field names
+PROFILE_FIELD_MAPPING = {
+    "company_info": "Company Info",
+    "focus": "Focus",
+    "region": "Region",
+    "company_size": "Company Size",
+    "capital_raised": "Capital Raised",
+    "recent_developments": "Recent Developments",
+    "partnerships": "Partnerships",
+    "media_mentions": "Media Mentions",
+    "humanoids_focus": "Humanoid Robotics Use Case",
+    "single_use_case_type": "Single Use Cases",
+    "streamlined_tasks": "Task Streamlining",
+    "project_launch_date": LAUNCH_DATE_FIELD
+}
+
+def apply_company_profile(listing, enriched: dict):
+    """
+    Fills fallbacks into an enriched company profile and copies it onto the listing
+    under both the raw keys and the Pydantic alias field names.
+    """
+    enriched.setdefault("region", "Unknown")
+    enriched.setdefault("focus", "Not Available")
+    enriched.setdefault("company_size", "Unknown")
+    enriched.setdefault("capital_raised", "Not Disclosed")
+    enriched.setdefault("recent_developments", "No updates available")
+    enriched.setdefault("partnerships", "None")
+    enriched.setdefault("media_mentions", 0)
+    enriched.setdefault("humanoids_focus", "No")
+    enriched.setdefault("single_use_case_type", "No")
+    enriched.setdefault("streamlined_tasks", "")
+    enriched.setdefault("project_launch_date", "TBD")
+    enriched.setdefault("company_info", "Not provided")
+
+    for k, v in PROFILE_FIELD_MAPPING.items():
+        if k in enriched:
+            listing[v] = enriched[k]
+
+    listing["description"] = enriched.get("company_info", "Not provided")
+    listing.update(enriched)
+
+
 def enrich_company_metadata(listing, model: str):
     # Normalize enriched keys to expected format (e.g., "Capital Raised" instead of "capital_raised")
    
@@ -89,11 +238,6 @@ def enrich_company_metadata(listing, model: str):
 
     combined_source = f"WEBSITE:\n{website_text}\n\nARTICLE:\n{article_text}"
 
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     prompt = f"""
 You are a Robotics Company Profiling AI. Your task is to extract structured metadata from the following company sources:
 
@@ -140,7 +284,7 @@ Use the structure below and fill in each field with detailed, informative respon
 """
 
     try:
-        response = completion(
+        response = scheduled_completion(
             model=model,
             messages=[
                 {"role": "system", "content": "You extract company profile insights from website and article text."},
@@ -150,47 +294,13 @@ Use the structure below and fill in each field with detailed, informative respon
 
         enriched = json.loads(response.choices[0].message.content)
 
-        # Fallbacks
-        enriched.setdefault("region", "Unknown")
-        enriched.setdefault("focus", "Not Available")
-        enriched.setdefault("company_size", "Unknown")
-        enriched.setdefault("capital_raised", "Not Disclosed")
-        enriched.setdefault("recent_developments", "No updates available")
-        enriched.setdefault("partnerships", "None")
-        enriched.setdefault("media_mentions", 0)
-        enriched.setdefault("humanoids_focus", "No")
-        enriched.setdefault("single_use_case_type", "No")
-        enriched.setdefault("streamlined_tasks", "")
-        enriched.setdefault("project_launch_date", "TBD")
-        enriched.setdefault("company_info", "Not provided")
-
-        #  Normalize to Pydantic alias field names
-        mapping = {
-            "company_info": "Company Info",
-            "focus": "Focus",
-            "region": "Region",
-            "company_size": "Company Size",
-            "capital_raised": "Capital Raised",
-            "recent_developments": "Recent Developments",
-            "partnerships": "Partnerships",
-            "media_mentions": "Media Mentions",
-            "humanoids_focus": "Humanoid Robotics Use Case",
-            "single_use_case_type": "Single Use Cases",
-            "streamlined_tasks": "Task Streamlining",
-            "project_launch_date": "Project Launch Date"
-        }
-        for k, v in mapping.items():
-            if k in enriched:
-                listing[v] = enriched[k]
-
-        listing["description"] = enriched.get("company_info", "Not provided")
-        listing.update(enriched)
+        apply_company_profile(listing, enriched)
 
         gnews_api_key = get_api_key("GNEWS")
         if gnews_api_key:
             company_name = listing.get("Company") or listing.get("company") or enriched.get("company_info", "")
             mentions_count = get_media_mentions(company_name, gnews_api_key)
-            listing["media_mentions"] = mentions_count
+            listing["media_mentions"] = listing["Media Mentions"] = mentions_count
 
     except Exception as e:
         print("[enrich_company_metadata] JSON parse error:", e)
@@ -223,11 +333,6 @@ def correlate_with_abm(listing, abm_summary: str, model: str):
     - listing["Correlation Reason"]: structured A–D reasoning
     """
 
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     company_data = {
         "description": listing.get("description", ""),
         "focus": listing.get("focus", ""),
@@ -242,12 +347,14 @@ def correlate_with_abm(listing, abm_summary: str, model: str):
         "company_size": listing.get("company_size", "")
     }
 
+    abm_passages = relevant_abm_context(abm_summary, json.dumps(company_data))
+
     # ✳️ PROMPT: A–D evaluation
     prompt = f"""
 You are an expert analyst evaluating how well a robotics company aligns with ABM Industries' strategic goals.
 
 ABM's strategy and services are summarized below:
-\"\"\"{abm_summary[:4000]}\"\"\"
+\"\"\"{abm_passages}\"\"\"
 
 ABM Services:
 - Building maintenance, HVAC, lighting
@@ -278,7 +385,7 @@ Only return this plain-text response. No bullet points, no markdown, no JSON, an
 
     try:
         #  Step 1: Generate correlation reasoning
-        response = completion(
+        response = scheduled_completion(
             model=model,
             messages=[
                 {"role": "system", "content": "You are an expert in business strategy and robotics alignment."},
@@ -296,7 +403,7 @@ Only return the number. Do not explain.
 
 \"\"\"{content}\"\"\"
 """
-        score_response = completion(
+        score_response = scheduled_completion(
             model=model,
             messages=[
                 {"role": "system", "content": "You are a strategic evaluator assigning fit scores from 1 to 5."},
@@ -322,11 +429,6 @@ def extract_single_use_case(listing, model: str):
     if not company_website_content:
         return
 
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     prompt = f"""
     You are an AI assistant analyzing robotics news and company information. Identify whether the company is developing robots for specific, single-use cases (e.g., a vacuum cleaner or delivery robot).
     If the company works on a single-use case robot, mention "Yes" and describe the task or function the robot is built for. If the company does not focus on single-use case robots, say "No" and provide a brief reason.
@@ -338,7 +440,7 @@ def extract_single_use_case(listing, model: str):
     }}
     """
     
-    response = completion(
+    response = scheduled_completion(
         model=model,
         messages=[{"role": "system", "content": "You extract information on single-use robotics."}, {"role": "user", "content": prompt}]
     )
@@ -356,11 +458,6 @@ def extract_task_streamlining(listing, model: str):
     if not company_website_content:
         return
 
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     prompt = f"""
     You are an AI assistant analyzing robotics news and company information. Determine whether the company is using robotics to streamline tasks within industries (e.g., improving efficiency in manufacturing, logistics, etc.).
     If the company works on improving processes or automating tasks across industries (like warehouse automation, cleaning, etc.), mention "Yes" and provide details on which tasks are being streamlined. If the company is not focused on task streamlining, say "No" and explain why.
@@ -372,7 +469,7 @@ def extract_task_streamlining(listing, model: str):
     }}
     """
     
-    response = completion(
+    response = scheduled_completion(
         model=model,
         messages=[{"role": "system", "content": "You extract information on task streamlining."}, {"role": "user", "content": prompt}]
     )
@@ -390,11 +487,6 @@ def extract_humanoid_use_case(listing, model: str):
     if not company_website_content:
         return
 
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     prompt = f"""
     You are an AI assistant analyzing robotics companies. Check if the company develops humanoid robots (robots with human-like features and capabilities).
     If the company is working on humanoid robots, respond with "Yes" and explain briefly what their humanoid robots are used for (e.g., service, healthcare, etc.). If the company does not focus on humanoid robotics, respond with "No" and provide a short explanation.
@@ -406,7 +498,7 @@ def extract_humanoid_use_case(listing, model: str):
     }}
     """
     
-    response = completion(
+    response = scheduled_completion(
         model=model,
         messages=[{"role": "system", "content": "You extract humanoid robotics information."}, {"role": "user", "content": prompt}]
     )
@@ -424,11 +516,6 @@ def extract_partnerships(listing, model: str):
     if not company_website_content:
         return
 
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     prompt = f"""
     You are an AI assistant. Look at the company's website and articles to extract any recent or strategic partnerships they have established.
     If there are any partnerships or collaborations with other companies, mention them here. If no partnerships are available, say "None" and explain that no partnership data is found.
@@ -440,7 +527,7 @@ def extract_partnerships(listing, model: str):
     }}
     """
     
-    response = completion(
+    response = scheduled_completion(
         model=model,
         messages=[{"role": "system", "content": "You extract partnerships from web content."}, {"role": "user", "content": prompt}]
     )
@@ -454,11 +541,6 @@ def extract_launch_date_from_article(article_text: str, model: str):
     """
     Extracts the launch date for any upcoming robotics project mentioned in the article.
     """
-    env_var = list(MODELS_USED[model])[0]
-    api_key = get_api_key(model)
-    if api_key:
-        os.environ[env_var] = api_key
-
     prompt = f"""
 You are a date extraction assistant. Your job is to find the launch date of any robotics project **only if it is clearly stated** in the article.
 
@@ -480,7 +562,7 @@ Return a JSON object:
 }}
 """
 
-    response = completion(
+    response = scheduled_completion(
         model=model,
         messages=[{"role": "system", "content": "You extract project launch dates from tech news."}, {"role": "user", "content": prompt}]
     )
@@ -491,3 +573,133 @@ Return a JSON object:
         print("[extract_launch_date_from_article] JSON parse error:", e)
         return {"project_launch_date": "TBD"}
 
+
+
+def enrich_listings_batch(items, abm_summary: str, model: str):
+    """
+    Batched replacement for the per-listing enrich_company_metadata ->
+    correlate_with_abm -> extract_launch_date_from_article fan-out.
+
+    `items` is a list of (listing, article_text) pairs, from one article or
+    several. Each distinct article is sent once, and every listing gets its
+    profile, A–D correlation reason, relevancy score and launch date from a
+    single structured completion. Results are mapped back by index and applied
+    to the listings in place.
+
+    Returns:
+        token_info dict with input_tokens / output_tokens for the request.
+    """
+    if not items:
+        return {"input_tokens": 0, "output_tokens": 0}
+
+    article_ids = {}
+    articles = []
+    companies = []
+    for idx, (listing, article_text) in enumerate(items):
+        if article_text not in article_ids:
+            article_ids[article_text] = len(articles)
+            articles.append(f"--- ARTICLE {len(articles)} ---\n{article_text[:4000]}")
+        companies.append({
+            "id": idx,
+            "article": article_ids[article_text],
+            "company": listing.get("Company") or listing.get("company", ""),
+            "extracted": {k: v for k, v in listing.items() if v and isinstance(v, (str, int, float))},
+        })
+
+    # Retrieve the ABM passages that match these companies and their articles
+    abm_passages = relevant_abm_context(abm_summary, json.dumps(companies) + "\n" + "\n".join(articles))
+
+    prompt = f"""
+You are a Robotics Company Profiling AI and an expert analyst of ABM Industries' strategy.
+
+ABM's strategy and services are summarized below:
+\"\"\"{abm_passages}\"\"\"
+
+ABM Services:
+- Building maintenance, HVAC, lighting
+- Parking & janitorial
+- Landscaping, sustainability & energy
+- Smart facilities (data-driven operations)
+- Commercial expansion into logistics and warehousing (if mentioned)
+
+Source articles:
+{chr(10).join(articles)}
+
+Companies to profile (each refers to one article by number):
+{json.dumps(companies, indent=2)}
+
+For EVERY company above return one object with these keys:
+- "id": the company's id, unchanged
+- "company_info": what the company builds, its robotics applications, environments and target users
+- "region": country or region where the company is based
+- "focus": robotics focus in 2–5 words
+- "company_size": Small / Medium / Large
+- "capital_raised": total capital raised, an inferred stage, or 'Not Disclosed'
+- "recent_developments": 2–3 key updates from the past 6–12 months
+- "partnerships": significant partnerships, or 'None'
+- "humanoids_focus": Yes/No plus a short explanation
+- "single_use_case_type": Yes/No plus a short rationale
+- "streamlined_tasks": the specific tasks the company's robots optimize
+- "project_launch_date": 'Month Year' ONLY if the article explicitly states it, otherwise 'TBD'. Never infer.
+- "correlation_reason": four lines in the exact format "A. ...\\nB. ...\\nC. ...\\nD. ..." covering
+  A. overlap with ABM's core or adjacent services, B. fit with ABM's smart facilities and innovation strategy,
+  C. robotics innovation or uniqueness, D. stage of technology maturity
+- "relevancy_score": a single digit from 1 (no alignment) to 5 (very strong alignment), consistent with the A–D reasoning
+
+Output only a valid JSON object of the form {{"companies": [ ... ]}}. No markdown or commentary.
+"""
+
+    try:
+        response = scheduled_completion(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You profile robotics companies and score their fit with ABM Industries."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+    except Exception as e:
+        # Keep the article's extraction: every listing falls back to the unscored defaults below
+        print("[enrich_listings_batch] Error:", e)
+        response = None
+
+    usage = getattr(response, "usage", None)
+    token_counts = {
+        "input_tokens": usage.prompt_tokens if usage else 0,
+        "output_tokens": usage.completion_tokens if usage else 0
+    }
+
+    results = []
+    if response is not None:
+        try:
+            raw_content = response.choices[0].message.content.strip("` \n")
+            if raw_content.lower().startswith("json"):
+                raw_content = raw_content[4:].strip()
+            results = json.loads(raw_content).get("companies", [])
+        except Exception as e:
+            print("[enrich_listings_batch] JSON parse error:", e)
+
+    by_id = {r.get("id"): r for r in results if isinstance(r, dict)}
+    for idx, (listing, article_text) in enumerate(items):
+        enriched = dict(by_id.get(idx, {}))
+        enriched.pop("id", None)
+        reason = enriched.pop("correlation_reason", "") or "Could not extract explanation."
+        score = str(enriched.pop("relevancy_score", "")).strip()
+
+        launch_date = enriched.get("project_launch_date", "TBD")
+        if launch_date != "TBD" and launch_date not in article_text:
+            enriched["project_launch_date"] = "TBD"
+
+        apply_company_profile(listing, enriched)
+        listing["Correlation Reason"] = reason
+        listing["Relevancy Score"] = score if score in ["1", "2", "3", "4", "5"] else "1"
+
+    # Media mentions for all companies at once; repeated companies share one GNews request
+    gnews_api_key = get_api_key("GNEWS")
+    if gnews_api_key:
+        names = [listing.get("Company") or listing.get("company", "") for listing, _ in items]
+        counts = get_media_mentions_many(names, gnews_api_key)
+        for (listing, _), name in zip(items, names):
+            if name:
+                listing["media_mentions"] = listing["Media Mentions"] = counts.get(name, 0)
+
+    return token_counts